@@ -1,15 +1,23 @@
 
 import sys
+import time
+launchTime = time.perf_counter()
 import typing
 from PyQt5 import QtGui
-from PyQt5.QtCore import Qt, QSettings, QTimer, pyqtSignal, QFile, QDate, QTime, QProcess, QSize, QUrl
-from PyQt5.QtGui import QIcon, QPixmap, QColor, QFont, QDesktopServices
+from PyQt5.QtCore import Qt, QSettings, QTimer, pyqtSignal, QFile, QTime, QSize, QUrl, QSocketNotifier, QRectF, QPointF, QLineF, QThread
+from PyQt5.QtGui import QIcon, QColor, QFont, QDesktopServices, QPainter, QPen
 from PyQt5.QtWidgets import QApplication, QColorDialog, QWidget, QToolButton, QFontDialog, QSpinBox, QVBoxLayout, QDialog, QButtonGroup, QSystemTrayIcon, QLineEdit, QPushButton, QGridLayout, QHBoxLayout, QLabel, QMenu, QAction
-from enum import Enum
-import json
+from datetime import datetime, timedelta
 from pathlib import Path
-from csv import writer as csvWriter
-from batteryGetter import BatteryStatus
+from historyBinary import exportFolder, hasNumpy, numpy
+from historyArchive import HistoryArchive
+from historyQuery import lttb
+import ptcCore as core
+from metrics import metrics
+from notifier import NotificationDispatcher
+from iconRenderer import IconRenderer
+from instanceGuard import InstanceGuard, sendCommand
+from ptcCore import Setting, State, BatterChecker, PollScheduler, StartupProfile, getFontWeightL, getToastIcon, normalSettings, historyFolder
 from _rc import resource
 import os
 from QtHelper.components.SystemTrayIcon import SystemTrayIcon as CSystemTrayIcon
@@ -33,203 +41,91 @@ def setQSS(*widgets: QWidget, filePath:str):
     for widget in widgets:
         widget.setStyleSheet(qss)
 
-class JsonManager:
-   
-    @classmethod
-    def readData(cls):
-        try:
-            with open(str(settingPath), "r") as file:
-                return json.load(file)
-        except Exception as e:
-            cls.writeData()
-            return {}
-    
-    @classmethod
-    def writeData(cls):
-        dirManager.validateMainPath()
-        with open(str(settingPath), "w") as file:
-            json.dump(Setting.toDict(), file)
-
-def writeBatteryStatus(per, pluggedIn:bool):
-    date = str(QDate.currentDate().toPyDate())
-    with open(str(dirManager.validateMainPath()/(date+'-ptc'+'.csv')), 'a+', newline='') as file:
-        csvWriter(file).writerow((QTime.currentTime().toString(), f"{'+'if pluggedIn else '-'}{per}"))
-
-class Setting(Enum):
-    OnChargingColor = '#24f000'
-    NormalColor = '#1ee7fd'
-    LowColor = '#ff0f0f'
-    CriticalColor = '#df00da'
-    
-    FontSize = 14
-    FontFamily = 'Arial Rounded MT Bold'
-    FontWeight = 75
-
-    LowBatteryLevel = 40
-    NormalBatteryLevels = list(range(LowBatteryLevel, 100, 10))
-    FullBatteryLevel = 100
-    CriticalLevel = 25
-    
-    updateDelay = 2.5
-    HisFileUpdateDelay = 1.5
-    
-    @classmethod
-    def toDict(cls):
-        return {member.name: member.value for member in cls}
-    
-    @classmethod
-    def fromDict(cls, d:dict):
-        for name, value in d.items():
-            try:
-                cls[name]._value_ = value
-            except:pass
-    
-    @property
-    def v(self):
-        return self.value
-    
-    @v.setter
-    def v(self, v):
-        self.setValue(v, self.updateFile)
-    
-    def setValue(self, v, after=lambda:None):
-        if self._value_ == v:
-            return
-        self._value_ = v
-        after()
-    
-    @classmethod
-    def updateFile(cls):
-        JsonManager.writeData()
-    
-    def getValidValue(self, cls):
-        try:
-            v = cls(self.v)
-        except:
-            v = normalSettings[self.name]
-            self.v = v
-        
-        return v
-
-def getToastIcon(p:QIcon|str):
-    return QIcon(QIcon(p).pixmap(32, 32))
-
-class State:
-    class Ctuple(tuple):
-
-        def title(self):
-            return self[0]+' Notify'
-        def message(self, per):
-            return self[1] + f'\nBattery is {per}%'
-        def icon(self):
-            return getToastIcon(self[2])
-        def color(self):
-            return self[3]
-
-    Low = Ctuple(('Low Battery', 'Pluged-In Your Device', ":immiApplication/icon/LowBattery.png", Setting.LowColor))
-    Normal = Ctuple(('Normal Battery', '', ":immiApplication/icon/NormalBattery.png", Setting.NormalColor))#* getToastIcon
-    Full = Ctuple(('Full Battery', 'Your Device is Full Charged', ":immiApplication/icon/FullCharging.png", Setting.NormalColor))
-    Critical = Ctuple(('Critical Battery', 'Pluged-In Your Device', Low[2], Setting.CriticalColor))
-    PluggedIn = Ctuple(('Plugged In', 'Charging...', ":immiApplication/icon/ChargingIn.png", Setting.OnChargingColor))
-    PluggedOut = Ctuple(('Plugged Out', '', ":immiApplication/icon/ChargingOut.png", Setting.NormalColor))
-
-class BatterChecker:
-    def __init__(self, parent):
-        self.previousStatus, self.previousPer = BatteryStatus.get_state()
-
-        self.previousState = State.Normal
-        self.trayIcon:SystemTrayIcon = parent
-        self.lastFileWriteTime = self.lastNotifyTime = QTime.currentTime()
+def exitApp():
+    core.shutdown()
+    sys.exit()
 
+class QtPollScheduler(PollScheduler):
+    def __init__(self, checker:BatterChecker, eventDriven=False, parent=None):
+        super().__init__(checker, eventDriven)
+        self.timer = QTimer(parent)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.CoarseTimer)
+        self.timer.timeout.connect(self.wake)
 
-        self.writeBatteryStatus(force=True)
-
-    def check(self, *args, force=False):
-        pluggedIn, per = BatteryStatus.get_state()
-        statusIsChanged = pluggedIn != self.previousStatus
-        perIsChanged = per != self.previousPer
-        batteryStageIsChanged = statusIsChanged or perIsChanged
-        
-        def getState():
-            if pluggedIn and per >= Setting.FullBatteryLevel.v:
-                return State.Full
-            elif not pluggedIn and per <= Setting.LowBatteryLevel.v:
-                if per <= Setting.CriticalLevel.v:
-                    return State.Critical
-                return State.Low
-            elif per in Setting.NormalBatteryLevels.v:
-                return State.Normal
-        
-        state = getState()
-        ct = QTime.currentTime()
-        
-        if not force and not batteryStageIsChanged:
-            if (state in [State.Critical, State.Full] and (self.previousState != state or self.lastNotifyTime.secsTo(ct) >= 30)):pass
-            else:return
-            
-        color = Setting.OnChargingColor if pluggedIn else (state.color() if state else Setting.NormalColor)
-        state = (State.PluggedIn if pluggedIn else State.PluggedOut) if statusIsChanged else state
-
-        if state in [State.Critical, State.Full]:
-            self.lastNotifyTime = ct
-
-        self.previousStatus, self.previousPer, self.previousState = pluggedIn, per, state or State.Normal
-        if state:
-            self.trayIcon.sendMessage.emit(state)
-
-        self.trayIcon.setPixmap(color, per)
-        self.writeBatteryStatus(force=statusIsChanged)
-    
-    def recheck(self):
-        self.check(force=True)
-    
-    def writeBatteryStatus(self, *args, force=False):
-        if force or self.lastFileWriteTime.secsTo(ct:=QTime.currentTime())/60 >= Setting.HisFileUpdateDelay.getValidValue(float):# or self.lastFileWriteTime is None
-            writeBatteryStatus(self.previousPer, self.previousStatus)
-            self.lastFileWriteTime = ct
+    def _arm(self, secs):
+        super()._arm(secs)
+        self.timer.start(int(secs*1000))
 
 class SystemTrayIcon(CSystemTrayIcon):
     sendMessage = pyqtSignal(State.Ctuple)
+    policyFailed = pyqtSignal(str)
     
     def __init__(self, parent=None):
         super().__init__(pgIcon, parent)
-        self.doubleClicked.connect(lambda:w.setVisible(not w.isVisible()))
-        self.batteryChecker = BatterChecker(self)
-
-        self.sendMessage.connect(self._sendMessage)
+        self.iconRenderer = IconRenderer()
+        self._window = None
+        self.doubleClicked.connect(lambda:self.window().setVisible(not self.window().isVisible()))
+        self.batteryChecker = BatterChecker(notify=self.sendMessage.emit, update=self.setPixmap, snapshot=core.stateSnapshot)
+
+        self.toastIcons = {state[2]: getToastIcon(state[2]) for state in State.members()}
+        self.dispatcher = NotificationDispatcher(
+            self._sendMessage,
+            window=Setting.NotifyCoalesceWindow.getValidValue(float),
+            limits={State.Critical: (1/25, 2), State.Full: (1/25, 2), State.PluggedIn: (1/10, 3), State.PluggedOut: (1/10, 3)},
+            groups={State.PluggedIn: 'plug', State.PluggedOut: 'plug'},
+        )
+        self.notifyTimer = QTimer(self)
+        self.notifyTimer.setSingleShot(True)
+        self.notifyTimer.timeout.connect(self._pumpMessages)
+        self.sendMessage.connect(self._queueMessage)
+        self.policyFailed.connect(lambda message:self.showMessage('Power Policy', f'Could not apply power settings\n{message}', pgIcon))
+        core.policyFailedHooks.append(self.policyFailed.emit)
         
-        self.timer = QTimer()
-        self.timer.setInterval(int(Setting.updateDelay.getValidValue(float)*1000))
-        self.timer.start()
-        self.timer.timeout.connect(self.batteryChecker.check)
+        fd = core.BatteryStatus.fileno()
+        self.scheduler = QtPollScheduler(self.batteryChecker, eventDriven=fd is not None, parent=self)
+        core.scheduleTasks(self.scheduler)
+        self.scheduler.start()
 
-        self.BSWTimer = QTimer()
-        self.BSWTimer.setInterval(30000)
-        self.BSWTimer.start()
-        self.BSWTimer.timeout.connect(self.batteryChecker.writeBatteryStatus)
+        if fd is not None:
+            self.sourceNotifier = QSocketNotifier(fd, QSocketNotifier.Read, self)
+            self.sourceNotifier.activated.connect(self._onSourceActivated)
 
         self.menu = QMenu(parent=parent)
-        self.menu.addAction(QAction(text=windowTitle, parent=self.menu, triggered=lambda:w.show()))
-        self.menu.addAction(QAction(text='Setting', parent=self.menu, triggered=lambda:w.show()))
+        self.menu.addAction(QAction(text=windowTitle, parent=self.menu, triggered=lambda:self.window().show()))
+        self.menu.addAction(QAction(text='Setting', parent=self.menu, triggered=lambda:self.window().show()))
         self.menu.addAction(QAction(text='Github Repo', parent=self.menu, triggered=AboutDialog.open_github))
-        self.menu.addAction(QAction(text='exit', parent=self.menu, triggered=sys.exit))
+        self.menu.addAction(QAction(text='exit', parent=self.menu, triggered=exitApp))
         self.setContextMenu(self.menu)
       
+    def window(self):
+        if self._window is None:
+            self._window = Demo(self)
+            profile.mark('settings window')
+        return self._window
+
+    def _onSourceActivated(self, *args):
+        if core.BatteryStatus.changed():
+            self.scheduler.wake()
+
     def setPixmap(self, color:Setting.LowColor, per:int):
-        pixmap = QPixmap()
-        svg_string = f'''
-        <svg viewBox="0 0 20 20" xmlns="http://www.w3.org/2000/svg">
-        <text fill="{color.v}" x="10" y="16" font-size="{int(Setting.FontSize.getValidValue(int)*1.33333333333)+1}px" text-anchor="middle" font-weight='{getFontWeightL(Setting.FontWeight.getValidValue(int))}' font-family='{Setting.FontFamily.v}'>{per}</text>
-        </svg>'''
-        pixmap.loadFromData((svg_string.encode('utf-8')))
-        if per >= 100:
-            pixmap = ":immiApplication/icon/fullBattery.svg"
-
-        self.setIcon(QIcon(pixmap))
-        self.setToolTip(f'Battery is {per}%\nStatus: '+ ('AC (charging)' if self.batteryChecker.previousStatus else 'DC (battery)'))
+        self.setIcon(self.iconRenderer.icon(color.v, per))
+        estimate = self.batteryChecker.estimate()
+        self.setToolTip(f'Battery is {per}%\nStatus: '+ ('AC (charging)' if self.batteryChecker.previousStatus else 'DC (battery)') + (f'\n{estimate}' if estimate else ''))
         
+    def _queueMessage(self, state: State.Ctuple):
+        self._armNotifyTimer(self.dispatcher.submit(state))
+
+    def _pumpMessages(self):
+        self._armNotifyTimer(self.dispatcher.pump())
+
+    def _armNotifyTimer(self, deadline):
+        if deadline is not None:
+            self.notifyTimer.start(max(int((deadline-time.monotonic())*1000), 0))
+
     def _sendMessage(self, state: State.Ctuple):
-        self.showMessage(state.title(), state.message(self.batteryChecker.previousPer), state.icon())
+        icon = self.toastIcons.get(state[2]) or self.toastIcons.setdefault(state[2], state.icon())
+        self.showMessage(state.title(), state.message(self.batteryChecker.previousPer, self.batteryChecker.estimate()), icon)
 
 class HeadingLabel(QLabel):
     lbFont = getFont(13, QFont.Medium)
@@ -293,17 +189,162 @@ class AboutDialog(QDialog):
         email_url = QUrl("mailto:" + email_address)
         QDesktopServices.openUrl(email_url)
 
+class HistoryLoader(QThread):
+    chunkLoaded = pyqtSignal(object, object, object)
+
+    def __init__(self, start:float, end:float, parent=None):
+        super().__init__(parent)
+        self.start_, self.end = start, end
+
+    def chunks(self):
+        start = datetime.fromtimestamp(self.start_)
+        while start.timestamp() < self.end:
+            nextMonth = (start.replace(day=1)+timedelta(days=32)).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+            yield start.timestamp(), min(nextMonth.timestamp(), self.end)
+            start = nextMonth
+
+    def run(self):
+        archive, np = HistoryArchive(historyFolder), numpy()
+        for start, end in self.chunks():
+            if self.isInterruptionRequested():
+                return
+            rows = np.array([row for row in archive.iterSamples(start, end) if row[0] < end or end == self.end], dtype=np.int64)
+            if len(rows):
+                self.chunkLoaded.emit(rows[:, 0], rows[:, 1], rows[:, 2])
+
+class HistoryChart(QWidget):
+    margin = 28
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMinimumSize(520, 240)
+        self.clear(0, 1)
+
+    def clear(self, start, end):
+        self.start, self.end = start, end
+        self.parts = []
+        self.data = None
+        self.reduced = None
+
+    def addChunk(self, t, per, plugged):
+        self.parts.append((t, per, plugged))
+        self.data = self.reduced = None
+        self.update()
+
+    def samples(self):
+        if self.data is None and self.parts:
+            self.data = tuple(numpy().concatenate(p) for p in zip(*self.parts))
+        return self.data
+
+    def sampleCount(self):
+        return sum(len(t) for t, _, _ in self.parts)
+
+    def resizeEvent(self, event):
+        self.reduced = None
+        super().resizeEvent(event)
+
+    def plotRect(self):
+        return QRectF(self.margin, 8, self.width()-self.margin-8, self.height()-self.margin)
+
+    def toPoint(self, rect:QRectF, t, per):
+        return QPointF(rect.left()+(t-self.start)/max(self.end-self.start, 1)*rect.width(), rect.bottom()-per/100*rect.height())
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        rect = self.plotRect()
+        painter.setFont(getFont(11))
+        painter.setPen(QColor(150, 150, 150))
+        for per in (0, 50, 100):
+            y = rect.bottom()-per/100*rect.height()
+            painter.drawLine(QPointF(rect.left(), y), QPointF(rect.right(), y))
+            painter.drawText(QRectF(0, y-8, self.margin-4, 16), Qt.AlignRight|Qt.AlignVCenter, str(per))
+        for ts, align in ((self.start, Qt.AlignLeft), (self.end, Qt.AlignRight)):
+            painter.drawText(QRectF(rect.left(), rect.bottom()+4, rect.width(), 16), align, datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M'))
+
+        if (data := self.samples()) is None:
+            return
+        t, per, plugged = data
+        np = numpy()
+        charging = QColor(Setting.OnChargingColor.v)
+        charging.setAlpha(50)
+        edges = np.flatnonzero(np.diff(plugged))+1
+        for a, b in zip(np.concatenate(([0], edges)), np.concatenate((edges, [len(t)]))):
+            if plugged[a]:
+                left, right = self.toPoint(rect, t[a], 0).x(), self.toPoint(rect, t[b-1], 0).x()
+                painter.fillRect(QRectF(left, rect.top(), max(right-left, 1), rect.height()), charging)
+
+        if self.reduced is None:
+            idx = lttb(t, per, max(int(rect.width()), 3))
+            points = [self.toPoint(rect, t[i], per[i]) for i in idx]
+            self.reduced = [QLineF(a, b) for a, b in zip(points, points[1:])]
+        painter.setPen(QPen(QColor(Setting.NormalColor.v), 1.5))
+        painter.drawLines(self.reduced)
+
+class HistoryDialog(QDialog):
+    ranges = (('Day', 1), ('Week', 7), ('Month', 31), ('All', None))
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.setWindowTitle('Battery History')
+        self.loader = None
+        layout = QVBoxLayout(self)
+        buttons = QHBoxLayout()
+        self.rangeGroup = QButtonGroup(self)
+        for i, (text, days) in enumerate(self.ranges):
+            btn = QPushButton(text, self)
+            btn.setCheckable(True)
+            self.rangeGroup.addButton(btn, i)
+            buttons.addWidget(btn)
+        self.statusLabel = QLabel(self)
+        buttons.addWidget(self.statusLabel, 1, Qt.AlignRight)
+        self.chart = HistoryChart(self)
+        layout.addLayout(buttons)
+        layout.addWidget(self.chart, 1)
+        self.rangeGroup.idClicked.connect(self.showRange)
+        self.rangeGroup.button(0).setChecked(True)
+        self.showRange(0)
+
+    def showRange(self, i):
+        self.stopLoader()
+        core.historyWriter.flush()
+        end = time.time()
+        days = self.ranges[i][1]
+        if days is None:
+            first = HistoryArchive(historyFolder).firstDay()
+            start = datetime.fromisoformat(first).timestamp() if first else end-86400
+        else:
+            start = end-days*86400
+        self.chart.clear(start, end)
+        self.loader = HistoryLoader(start, end, self)
+        self.loader.chunkLoaded.connect(self.onChunk)
+        self.loader.finished.connect(lambda:self.statusLabel.setText(f'{self.chart.sampleCount()} samples'))
+        self.statusLabel.setText('Loading...')
+        self.loader.start()
+
+    def onChunk(self, t, per, plugged):
+        self.chart.addChunk(t, per, plugged)
+        self.statusLabel.setText(f'Loading... {self.chart.sampleCount()} samples')
+
+    def stopLoader(self):
+        if self.loader:
+            self.loader.requestInterruption()
+            self.loader.wait()
+            self.loader = None
+
+    def closeEvent(self, event):
+        self.stopLoader()
+        super().closeEvent(event)
+
 class Demo(QWidget):
 
-    def __init__(self):
+    def __init__(self, systemTrayIcon:SystemTrayIcon):
         super().__init__()
 
         self.setWindowTitle(windowTitle)
         self.pgIcon = pgIcon
         
-        self.systemTrayIcon = SystemTrayIcon(self)
-        self.systemTrayIcon.batteryChecker.recheck()
-        self.systemTrayIcon.show()
+        self.systemTrayIcon = systemTrayIcon
         self.secondHand = secondHand(self)
         
         self.setWindowIcon(self.pgIcon)
@@ -314,7 +355,7 @@ class Demo(QWidget):
         self.mainLayout.setHorizontalSpacing(10)
         self._initUi()
         
-        self.setFixedSize(303, 500)
+        self.setFixedSize(303, 540 if hasNumpy() else 500)
         self.setWindowFlags(self.windowFlags() & ~Qt.WindowMaximizeButtonHint & ~Qt.WindowMinimizeButtonHint)
         
     def _initUi(self):
@@ -372,6 +413,15 @@ class Demo(QWidget):
         showHisBtn.setIconSize(QSize(15, 15))
         showHisBtn.setFont(HeadingLabel.lbFont)
         self.mainLayout.addWidget(showHisBtn, row, 0, 1, self.mainLayout.columnCount())
+
+        if hasNumpy():
+            row+=1
+            chartBtn = QPushButton(' History Chart', self, clicked=self.secondHand.showHistoryChart)
+            chartBtn.setFixedHeight(30)
+            chartBtn.setIcon(QIcon(":immiApplication/icon/History.svg"))
+            chartBtn.setIconSize(QSize(15, 15))
+            chartBtn.setFont(HeadingLabel.lbFont)
+            self.mainLayout.addWidget(chartBtn, row, 0, 1, self.mainLayout.columnCount())
         
         row +=1
         savelb = HeadingLabel('Save required only when change levels', self)
@@ -504,7 +554,8 @@ class Demo(QWidget):
                     le.setValue(max(self.LEGroup[Setting.LowBatteryLevel].value()-1, 0))
             v = le.value()
             levelmem.setValue(v)
-        self.secondHand.setBatterySaverCmd()
+        self.systemTrayIcon.batteryChecker.machine.table.rebuild()
+        core.applyPowerPolicy()
         self.systemTrayIcon.batteryChecker.recheck()
         Setting.updateFile()
 
@@ -518,12 +569,16 @@ class secondHand:
     
     def showAboutDialog(self):
         AboutDialog(self.p).exec()
+
+    def showHistoryChart(self):
+        HistoryDialog(self.p).exec()
     
     def openHistoryFolder(self):
-        QProcess(self.p).start(f'explorer "{str(historyFolder.absolute())}"')
-        
-    def setBatterySaverCmd(self):
-        QProcess(self.p).start(f'powercfg /setdcvalueindex scheme_current sub_energysaver esbattthreshold {Setting.LowBatteryLevel.getValidValue(int)}')
+        folder = historyFolder
+        if Setting.HisFormat.v == 'bin':
+            core.historyWriter.flush()
+            folder = exportFolder(historyFolder)
+        QDesktopServices.openUrl(QUrl.fromLocalFile(str(folder.absolute())))
 
 if __name__ == '__main__':
 
@@ -531,36 +586,65 @@ if __name__ == '__main__':
     QApplication.setAttribute(Qt.AA_EnableHighDpiScaling)
     QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps)
 
+    profile = StartupProfile(launchTime)
+    profile.mark('imports')
     app = QApplication(sys.argv)
+    profile.mark('QApplication')
     
     pgIcon = QIcon(":immiApplication/power_traycon.png")
     windowTitle = "Power TrayCon"
 
+    command = sys.argv[sys.argv.index('--command')+1] if '--command' in sys.argv[:-1] else None
+    guard = InstanceGuard()
+    if not guard.acquire():
+        reply = sendCommand(command or 'show')
+        print(reply or f'{windowTitle} is running but not responding', flush=True)
+        sys.exit(0 if reply and reply.startswith('ok') else 1)
+    elif command not in (None, 'show'):
+        sys.exit(f'{windowTitle} is not running')
+
+    core.setSource()
     try:
-        if BatteryStatus._hasBattery() and BatteryStatus.get_state()[1]>=0:
+        if core.hasBattery():
             dirManager = DirManager()
             dirManager.chDir2ExeDir()
 
-            
-            dataFolder = Path('data')
-            historyFolder = dataFolder/ 'history'
-            settingPath = str(dataFolder/'data.json')
-
-            dirManager.validateMainPath()
-
-
-            normalSettings = Setting.toDict()
-            Setting.fromDict(JsonManager.readData())
-            
-            getFontWeightL = lambda i=int():'bold' if i==75 else 'normal'
-
-            w = Demo()
-            w.hide()
-            w.systemTrayIcon.sendMessage.emit(w.systemTrayIcon.batteryChecker.previousState)
-            w.secondHand.setBatterySaverCmd()
-            
+            core.start()
+            app.aboutToQuit.connect(core.shutdown)
+            app.aboutToQuit.connect(guard.release)
+            metrics.instrument(SystemTrayIcon, 'setPixmap', 'set_pixmap')
+            metrics.instrument(SystemTrayIcon, '_sendMessage', 'notify')
+            profile.mark('settings and history')
+
+            tray = SystemTrayIcon()
+            if not (resumed := tray.batteryChecker.resume()):
+                tray.batteryChecker.recheck()
+            tray.show()
+            profile.mark('tray icon')
+            QTimer.singleShot(0, lambda:profile.mark('first event loop turn'))
+
+            if not resumed:
+                tray.sendMessage.emit(tray.batteryChecker.previousState)
+            core.applyPowerPolicy()
+            tray.iconRenderer.prewarm([Setting.NormalColor.v, Setting.OnChargingColor.v, Setting.LowColor.v, Setting.CriticalColor.v])
+            QTimer.singleShot(5000, tray.window)
+
+            def showWindow(arg):
+                window = tray.window()
+                window.show()
+                window.raise_()
+                window.activateWindow()
+            def status(arg=''):
+                checker = tray.batteryChecker
+                return f"{checker.previousPer} {'+' if checker.previousStatus else '-'} {checker.machine.band.name() if checker.machine.band else 'Normal'}"
+            guard.on('show', showWindow)
+            guard.on('status', status)
+            guard.on('recheck', lambda arg:(tray.batteryChecker.recheck(), status())[1])
+            guard.on('exit', lambda arg:QTimer.singleShot(0, exitApp))
 
             dirManager.setAutoStartUp(windowTitle)
+            if '--profile' in sys.argv:
+                QTimer.singleShot(6000, lambda:print(profile.report(), flush=True))
 
         else:
             sticon = QSystemTrayIcon()
@@ -0,0 +1,215 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from historyArchive import HistoryArchive, dayFiles
+from historyBinary import numpy
+from historyQuery import MAX_GAP, loadDay
+
+
+np = numpy()
+HIGH_LEVELS = (80, 90, 100)
+DOD_BINS = 10
+CACHE_NAME = 'health.json'
+CACHE_VERSION = 1
+
+
+def emptyPartial():
+    return {'discharged': 0, 'charged': 0, 'observedSecs': 0, 'rateSecs': 0, 'ratePoints': 0,
+            'high': [0]*len(HIGH_LEVELS), 'segments': [], 'first': None, 'last': None}
+
+def analyzeArrays(t, per, plugged) -> dict:
+    partial = emptyPartial()
+    if not len(t):
+        return partial
+    per, plugged = per.astype(np.int64), plugged.astype(bool)
+    gaps = np.diff(t)
+    dt, dp = np.clip(gaps, 0, MAX_GAP), np.diff(per)
+    battery = ~plugged[:-1] & ~plugged[1:]
+    charging = plugged[:-1] & plugged[1:]
+    rate = battery & (gaps <= MAX_GAP)
+    partial.update(
+        discharged=int(-dp[battery & (dp < 0)].sum()), charged=int(dp[charging & (dp > 0)].sum()),
+        observedSecs=int(dt.sum()), rateSecs=int(dt[rate].sum()), ratePoints=int(-dp[rate & (dp < 0)].sum()),
+        high=[int(dt[per[:-1] >= level].sum()) for level in HIGH_LEVELS],
+        first=[int(t[0]), int(per[0]), bool(plugged[0])], last=[int(t[-1]), int(per[-1]), bool(plugged[-1])])
+
+    breaks = np.flatnonzero((plugged[1:] != plugged[:-1]) | (gaps > MAX_GAP))+1
+    starts, ends = np.concatenate(([0], breaks)), np.concatenate((breaks, [len(t)]))
+    lows = np.minimum.reduceat(per, starts)
+    partial['segments'] = [[int(t[a]), int(t[b-1]), int(per[a]), int(low)] for a, b, low in zip(starts, ends, lows) if not plugged[a]]
+    return partial
+
+def analyzeSource(kind, name, paths) -> dict:
+    days = {}
+    if kind == 'archive':
+        rows = list(HistoryArchive(Path(paths[0]).parent).iterArchive(Path(paths[0])))
+        for ts, per, plugged in rows:
+            days.setdefault(str(datetime.fromtimestamp(ts).date()), []).append((ts, per, plugged))
+        for day, dayRows in days.items():
+            t, per, plugged = map(np.array, zip(*dayRows))
+            days[day] = analyzeArrays(t.astype(np.int64), per, plugged)
+        return days
+
+    parts = [loadDay(Path(path)) for path in paths]
+    t, per, plugged = (np.concatenate(column) for column in zip(*parts))
+    order = np.argsort(t, kind='stable')
+    days[name] = analyzeArrays(t[order], per[order], plugged[order])
+    return days
+
+def signature(paths):
+    return [[Path(p).name, (st := os.stat(p)).st_size, st.st_mtime_ns] for p in paths]
+
+
+class HealthReport:
+    def __init__(self, folder, workers=None, useCache=True) -> None:
+        self.folder = Path(folder)
+        self.workers = workers
+        self.cachePath = self.folder/CACHE_NAME
+        self.cache = self.loadCache() if useCache else {}
+        self.computed = self.cached = 0
+
+    def loadCache(self) -> dict:
+        try:
+            data = json.loads(self.cachePath.read_text())
+        except (OSError, ValueError):
+            return {}
+        return data.get('sources', {}) if data.get('version') == CACHE_VERSION else {}
+
+    def saveCache(self):
+        tmp = self.cachePath.with_suffix('.tmp')
+        tmp.write_text(json.dumps({'version': CACHE_VERSION, 'sources': self.cache}))
+        os.replace(tmp, self.cachePath)
+
+    def sources(self) -> dict:
+        sources = {p.name: ('archive', [str(p)]) for p in HistoryArchive(self.folder).archives()}
+        sources.update((day, ('day', [str(p) for p in sorted(paths)])) for day, paths in dayFiles(self.folder).items())
+        return sources
+
+    def partials(self) -> dict:
+        sources = self.sources()
+        stale = {}
+        for name, (kind, paths) in sources.items():
+            sig = signature(paths)
+            if self.cache.get(name, {}).get('signature') == sig:
+                self.cached += 1
+            else:
+                stale[name] = sig
+
+        if stale:
+            names = list(stale)
+            kinds, paths = [sources[n][0] for n in names], [sources[n][1] for n in names]
+            if len(names) > 1 and self.workers != 1:
+                with ProcessPoolExecutor(self.workers) as pool:
+                    results = list(pool.map(analyzeSource, kinds, names, paths, chunksize=8))
+            else:
+                results = list(map(analyzeSource, kinds, names, paths))
+            for name, days in zip(names, results):
+                self.cache[name] = {'signature': stale[name], 'days': days}
+            self.computed = len(names)
+
+        for name in set(self.cache)-set(sources):
+            del self.cache[name]
+        if stale or len(self.cache) != len(sources):
+            self.saveCache()
+
+        days = {}
+        for name in sorted(self.cache, key=lambda n: sources[n][0] != 'archive'):
+            days.update(self.cache[name]['days'])
+        return dict(sorted(days.items()))
+
+    def compute(self) -> dict:
+        begin = time.perf_counter()
+        days = self.partials()
+        total = emptyPartial()
+        months = {}
+        segments = []
+        previous = None
+        for day, partial in days.items():
+            if not partial['first']:
+                continue
+            parts = [partial]
+            if previous:
+                edge = list(zip(previous['last'], partial['first']))
+                parts.append(analyzeArrays(np.array(edge[0], np.int64), np.array(edge[1]), np.array(edge[2])))
+            for part in parts:
+                for key in ('discharged', 'charged', 'observedSecs', 'rateSecs', 'ratePoints'):
+                    total[key] += part[key]
+                total['high'] = [a+b for a, b in zip(total['high'], part['high'])]
+                month = months.setdefault(day[:7], {'ratePoints': 0, 'rateSecs': 0, 'discharged': 0})
+                for key in month:
+                    month[key] += part[key]
+
+            for segment in partial['segments']:
+                if segments and segment[0]-segments[-1][1] <= MAX_GAP:
+                    segments[-1][1] = segment[1]
+                    segments[-1][3] = min(segments[-1][3], segment[3])
+                else:
+                    segments.append(list(segment))
+            previous = partial
+
+        depths = [start-low for _, _, start, low in segments if start > low]
+        histogram = [0]*DOD_BINS
+        for depth in depths:
+            histogram[min(depth*DOD_BINS//100, DOD_BINS-1)] += 1
+
+        rates = {month: m['ratePoints']/(m['rateSecs']/3600) for month, m in months.items() if m['rateSecs'] >= 3600}
+        trend = None
+        if len(rates) >= 2:
+            index = [int(m[:4])*12+int(m[5:]) for m in rates]
+            trend = float(np.polyfit(index, list(rates.values()), 1)[0])
+
+        observed = total['observedSecs'] or 1
+        return {
+            'days': len(days), 'first': next(iter(days), None), 'last': next(reversed(days), None),
+            'observedHours': total['observedSecs']/3600,
+            'cycles': total['discharged']/100, 'chargedCycles': total['charged']/100,
+            'cyclesPerMonth': {month: m['discharged']/100 for month, m in months.items()},
+            'dodHistogram': histogram, 'dischargeSessions': len(depths), 'meanDoD': sum(depths)/len(depths) if depths else 0,
+            'highSoC': {f'>={level}': secs/observed for level, secs in zip(HIGH_LEVELS, total['high'])},
+            'dischargeRate': rates, 'rateTrend': trend,
+            'sources': {'computed': self.computed, 'cached': self.cached, 'seconds': time.perf_counter()-begin},
+        }
+
+
+def printReport(report):
+    print(f"{report['first']} .. {report['last']}: {report['days']} days, {report['observedHours']:.0f} h observed")
+    print(f"equivalent full cycles {report['cycles']:.1f} (charged {report['chargedCycles']:.1f})")
+    print(f"discharge sessions {report['dischargeSessions']}, mean depth {report['meanDoD']:.0f}%")
+    peak = max(report['dodHistogram']) or 1
+    for i, n in enumerate(report['dodHistogram']):
+        print(f'  {i*100//DOD_BINS:>3}-{(i+1)*100//DOD_BINS:<3}% {n:>6} {"#"*round(30*n/peak)}')
+    print('time at high charge ' + ', '.join(f'{level} {share:.0%}' for level, share in report['highSoC'].items()))
+    print('discharge rate by month (%/h)')
+    for month, rate in report['dischargeRate'].items():
+        print(f"  {month} {rate:6.2f}  {report['cyclesPerMonth'][month]:5.1f} cycles")
+    if report['rateTrend'] is not None:
+        print(f"trend {report['rateTrend']:+.3f} %/h per month")
+    s = report['sources']
+    print(f"{s['computed']} sources analyzed, {s['cached']} cached, {s['seconds']:.2f} s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Battery wear report over the whole history')
+    parser.add_argument('folder', nargs='?', default='data/history')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per core)')
+    parser.add_argument('--no-cache', action='store_true', help=f'ignore and rewrite {CACHE_NAME}')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args(argv)
+    if np is None:
+        sys.exit('numpy is required for the health report')
+
+    report = HealthReport(args.folder, args.workers, not args.no_cache).compute()
+    if args.json:
+        print(json.dumps(report, indent=1))
+    else:
+        printReport(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+import os
+import sys
+import socket
+import ctypes
+import ctypes.util
+from pathlib import Path
+
+
+class BatterySource:
+    name = 'base'
+
+    def __init__(self) -> None:
+        self.lastState = None
+
+    def get_state(self) -> tuple:
+        raise NotImplementedError
+
+    def _hasBattery(self) -> bool:
+        raise NotImplementedError
+
+    def get_metrics(self):
+        return None
+
+    def fileno(self):
+        return None
+
+    def _drain(self) -> bool:
+        return True
+
+    def changed(self) -> bool:
+        if not self._drain():
+            return False
+        state = self.get_state()
+        if state == self.lastState:
+            return False
+        self.lastState = state
+        return True
+
+    def close(self):...
+
+
+class GetterSource(BatterySource):
+    name = 'getter'
+
+    def __init__(self) -> None:
+        super().__init__()
+        from batteryGetter import BatteryStatus
+        self.getter = BatteryStatus
+
+    def get_state(self):
+        return self.getter.get_state()
+
+    def _hasBattery(self):
+        return self.getter._hasBattery()
+
+
+class InotifyWatcher:
+    IN_MODIFY = 0x002
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_NONBLOCK = 0o4000
+
+    def __init__(self, paths) -> None:
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(self.IN_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        mask = self.IN_MODIFY | self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+        for path in paths:
+            self.libc.inotify_add_watch(self.fd, str(path).encode(), mask)
+
+    def fileno(self):
+        return self.fd
+
+    def drain(self) -> bool:
+        got = False
+        while True:
+            try:
+                if not os.read(self.fd, 4096):
+                    break
+                got = True
+            except BlockingIOError:
+                break
+        return got
+
+    def close(self):
+        os.close(self.fd)
+
+
+class UeventWatcher:
+    def __init__(self) -> None:
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, socket.NETLINK_KOBJECT_UEVENT)
+        self.sock.bind((0, 1))
+        self.sock.setblocking(False)
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    @staticmethod
+    def isPowerSupply(msg: bytes) -> bool:
+        return b'SUBSYSTEM=power_supply' in msg.split(b'\0')
+
+    def drain(self) -> bool:
+        got = False
+        while True:
+            try:
+                msg = self.sock.recv(8192)
+            except BlockingIOError:
+                break
+            got = got or self.isPowerSupply(msg)
+        return got
+
+    def close(self):
+        self.sock.close()
+
+
+class SysfsSource(BatterySource):
+    name = 'sysfs'
+    SYSFS_ROOT = Path('/sys/class/power_supply')
+    METRICS = (('voltage_now', 1e-6), ('current_now', 1e-6), ('power_now', 1e-6), ('energy_now', 1e-6), ('temp', 0.1))
+
+    def __init__(self, root=SYSFS_ROOT, watch=True) -> None:
+        super().__init__()
+        self.root = Path(root)
+        self.batteries, self.adapters = self._scan()
+        self.watcher = None
+        if watch:
+            try:
+                self.watcher = UeventWatcher() if self.root == self.SYSFS_ROOT else InotifyWatcher(self.batteries + self.adapters)
+            except (OSError, AttributeError):
+                self.watcher = None
+
+    def _scan(self):
+        batteries, adapters = [], []
+        if self.root.is_dir():
+            for supply in sorted(self.root.iterdir()):
+                kind = self._read(supply/'type')
+                if kind == 'Battery' and self._read(supply/'present', '1') == '1':
+                    batteries.append(supply)
+                elif kind in ('Mains', 'USB', 'USB_C', 'USB_PD'):
+                    adapters.append(supply)
+        return batteries, adapters
+
+    @staticmethod
+    def _read(path: Path, default=None):
+        try:
+            return path.read_text().strip()
+        except OSError:
+            return default
+
+    def _readInt(self, path: Path, default=None):
+        try:
+            return int(self._read(path))
+        except (TypeError, ValueError):
+            return default
+
+    def _percent(self, battery: Path):
+        if (capacity := self._readInt(battery/'capacity')) is not None:
+            return capacity
+        for now, full in (('energy_now', 'energy_full'), ('charge_now', 'charge_full')):
+            n, f = self._readInt(battery/now), self._readInt(battery/full)
+            if n is not None and f:
+                return round(n*100/f)
+        return -1
+
+    def _hasBattery(self):
+        return bool(self.batteries)
+
+    def get_state(self):
+        if not self.batteries:
+            return False, -1
+        pluggedIn = any(self._read(a/'online') == '1' for a in self.adapters)
+        if not self.adapters:
+            pluggedIn = any(self._read(b/'status') in ('Charging', 'Full') for b in self.batteries)
+        per = round(sum(self._percent(b) for b in self.batteries)/len(self.batteries))
+        return pluggedIn, max(min(per, 100), -1)
+
+    def get_metrics(self):
+        if not self.batteries:
+            return None
+        readings = [[v*scale for b in self.batteries if (v := self._readInt(b/name)) is not None] for name, scale in self.METRICS]
+        voltage, current, power, energy, temperature = readings
+        if not power and voltage and current:
+            power = [abs(v*c) for v, c in zip(voltage, current)]
+        if not any(readings):
+            return None
+        return (sum(voltage)/len(voltage) if voltage else None, sum(current) if current else None,
+                sum(power) if power else None, sum(energy) if energy else None, max(temperature) if temperature else None)
+
+    def fileno(self):
+        return self.watcher.fileno() if self.watcher else None
+
+    def _drain(self):
+        return self.watcher.drain() if self.watcher else True
+
+    def close(self):
+        if self.watcher:
+            self.watcher.close()
+            self.watcher = None
+
+
+def getSource(root=None) -> BatterySource:
+    if root is not None:
+        return SysfsSource(root)
+    if sys.platform.startswith('linux'):
+        source = SysfsSource()
+        if source._hasBattery():
+            return source
+        source.close()
+    return GetterSource()
+
+
+class TraceSource(BatterySource):
+    name = 'trace'
+
+    def __init__(self, samples, loop=False) -> None:
+        super().__init__()
+        self.samples = list(samples)
+        self.loop = loop
+        self.index = 0
+
+    def get_state(self):
+        if self.loop:
+            return self.samples[self.index % len(self.samples)]
+        return self.samples[min(self.index, len(self.samples)-1)]
+
+    def advance(self, n=1) -> bool:
+        self.index += n
+        return self.loop or self.index < len(self.samples)
+
+    def _hasBattery(self):
+        return bool(self.samples)
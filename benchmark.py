@@ -0,0 +1,188 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from csv import writer as csvWriter
+from datetime import datetime, timedelta
+from pathlib import Path
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import ptcCore as core
+from batterySource import TraceSource
+from historyWriter import HistoryWriter
+from replay import makeTrace
+
+baselinePath = Path(__file__).resolve().parent/'benchmarkBaseline.json'
+
+
+def timeit(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        func()
+        times.append(time.perf_counter_ns()-start)
+    return times
+
+def summary(times_ns, unit=1000):
+    times = sorted(times_ns)
+    return {
+        'median': statistics.median(times)/unit,
+        'p95': times[int(len(times)*0.95)-1]/unit,
+        'n': len(times),
+    }
+
+
+def benchCheck(trace):
+    source = TraceSource(makeTrace(trace))
+    checker = core.BatterChecker(source)
+    times = []
+    while source.advance():
+        start = time.perf_counter_ns()
+        checker.check()
+        times.append(time.perf_counter_ns()-start)
+    return summary(times)
+
+def benchCheckAllocations(trace='discharge', ticks=2000):
+    source = TraceSource(makeTrace(trace, ticks))
+    checker = core.BatterChecker(source)
+    checker.check()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    while source.advance():
+        checker.check()
+    after = tracemalloc.take_snapshot()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+    return {'retainedBlocksPerTick': blocks/ticks, 'peakBytes': peak}
+
+def benchHistoryAppend(folder, rows=20000):
+    writer = HistoryWriter(folder/'buffered', maxAge=None, index=True)
+    start = datetime(2026, 1, 1)
+    begin = time.perf_counter()
+    for i in range(rows):
+        writer.append(50, i % 2 == 0, start+timedelta(seconds=30*i))
+    writer.close()
+    buffered = rows/(time.perf_counter()-begin)
+
+    legacyFolder = folder/'legacy'
+    legacyFolder.mkdir()
+    legacyRows = rows//10
+    begin = time.perf_counter()
+    for i in range(legacyRows):
+        when = start+timedelta(seconds=30*i)
+        with open(legacyFolder/(str(when.date())+'-ptc.csv'), 'a+', newline='') as file:
+            csvWriter(file).writerow((when.strftime('%H:%M:%S'), '+50'))
+    legacy = legacyRows/(time.perf_counter()-begin)
+    return {'rowsPerSec': buffered, 'legacyRowsPerSec': legacy}
+
+def benchSettingsWrite(repeat=200):
+    direct = summary(timeit(core.JsonManager.writeData, repeat))
+    def burst():
+        for member, value in ((core.Setting.FontFamily, 'Arial'), (core.Setting.FontSize, 13), (core.Setting.FontWeight, 50)):
+            member.v = value
+        for member, value in ((core.Setting.FontFamily, 'Arial Rounded MT Bold'), (core.Setting.FontSize, 14), (core.Setting.FontWeight, 75)):
+            member.v = value
+        core.JsonManager.flush()
+    return {'writeData': direct, 'burst': summary(timeit(burst, repeat//4))}
+
+def benchIconRender(repeat=300):
+    try:
+        from PyQt5.QtGui import QPixmap, QIcon
+        from PyQt5.QtWidgets import QApplication
+    except ImportError as e:
+        return {'skipped': str(e)}
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    color, size, weight, family = core.Setting.NormalColor.v, 19, 'bold', core.Setting.FontFamily.v
+
+    def legacy(per):
+        pixmap = QPixmap()
+        pixmap.loadFromData(f'''
+        <svg viewBox="0 0 20 20" xmlns="http://www.w3.org/2000/svg">
+        <text fill="{color}" x="10" y="16" font-size="{size}px" text-anchor="middle" font-weight='{weight}' font-family='{family}'>{per}</text>
+        </svg>'''.encode('utf-8'))
+        return QIcon(pixmap)
+    result = {'legacySvg': summary(timeit(lambda: legacy(random.randrange(100)), repeat))}
+
+    from iconRenderer import IconRenderer
+    renderer = IconRenderer()
+    result['render'] = summary(timeit(lambda: renderer.render(color, random.randrange(100)), repeat))
+    renderer.prewarm([color], chunk=101)
+    result['cached'] = summary(timeit(lambda: renderer.icon(color, random.randrange(100)), repeat))
+    return result
+
+
+def runAll():
+    results = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            core.setSource(TraceSource([(False, 80)]))
+            core.start()
+            for trace in ('discharge', 'charge', 'flapping'):
+                results[f'check.{trace}'] = benchCheck(trace)
+            results['check.allocations'] = benchCheckAllocations()
+            results['history.append'] = benchHistoryAppend(Path(tmp))
+            results['settings.write'] = benchSettingsWrite()
+            results['icon.render'] = benchIconRender()
+        finally:
+            core.shutdown()
+            os.chdir(cwd)
+    return results
+
+def flatten(results, prefix=''):
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f'{prefix}{key}.'))
+        elif isinstance(value, (int, float)) and not key == 'n':
+            flat[prefix+key] = value
+        elif key == 'skipped':
+            flat[prefix+key] = value
+    return flat
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    current = flatten(results)
+    for key, old in flatten(baseline).items():
+        if key not in current or isinstance(old, str) or isinstance(current[key], str) or not old:
+            continue
+        higherIsBetter = key.endswith('PerSec')
+        ratio = old/current[key] if higherIsBetter else current[key]/old
+        if ratio > 1+tolerance:
+            regressions.append((key, old, current[key], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Power TrayCon hot-path benchmarks')
+    parser.add_argument('--save-baseline', action='store_true', help=f'write results to {baselinePath.name}')
+    parser.add_argument('--check', action='store_true', help='exit with status 1 when a metric regresses past the tolerance')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='allowed slowdown ratio (default 0.5 = 50%%)')
+    args = parser.parse_args(argv)
+
+    results = runAll()
+    for key, value in flatten(results).items():
+        print(f'{key:<40}{value}' if isinstance(value, str) else f'{key:<40}{value:14.2f}')
+
+    if args.save_baseline:
+        baselinePath.write_text(json.dumps(results, indent=2))
+        print(f'baseline written to {baselinePath}')
+    elif baselinePath.exists():
+        regressions = compare(results, json.loads(baselinePath.read_text()), args.tolerance)
+        for key, old, new, ratio in regressions:
+            print(f'REGRESSION {key}: {old:.2f} -> {new:.2f} ({ratio:.2f}x)')
+        if regressions and args.check:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+def formatDuration(secs) -> str:
+    minutes = int(secs//60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}h {minutes:02}m' if hours else f'{minutes}m'
+
+
+class RateEstimator:
+    def __init__(self, alpha=0.3, maxRate=2.0) -> None:
+        self.alpha = alpha
+        self.maxRate = maxRate
+        self.reset()
+
+    def reset(self, ts=None, per=None, pluggedIn=None):
+        self.plugged = pluggedIn
+        self.lastPer = per
+        self.anchorTs = self.anchorPer = None
+        self.lastTs = ts
+        self.rate = None
+        self.samples = 0
+
+    def snapshot(self) -> dict:
+        return {key: getattr(self, key) for key in ('plugged', 'lastPer', 'anchorTs', 'anchorPer', 'lastTs', 'rate', 'samples')}
+
+    def restore(self, data:dict):
+        for key, value in data.items():
+            if hasattr(self, key):
+                setattr(self, key, value)
+
+    def update(self, ts, per, pluggedIn:bool):
+        if pluggedIn != self.plugged:
+            self.reset(ts, per, pluggedIn)
+            return
+        self.lastTs = ts
+        if per == self.lastPer:
+            return
+        self.lastPer = per
+        if self.anchorTs is None:
+            self.anchorTs, self.anchorPer = ts, per
+            return
+
+        elapsed = ts-self.anchorTs
+        if elapsed <= 0:
+            return
+        rate = (per-self.anchorPer)/elapsed
+        if abs(rate) > self.maxRate or (rate > 0) != bool(pluggedIn):
+            self.anchorTs, self.anchorPer = ts, per
+            return
+        self.rate = rate if self.rate is None else self.alpha*rate + (1-self.alpha)*self.rate
+        self.anchorTs, self.anchorPer = ts, per
+        self.samples += 1
+
+    def currentRate(self, now=None):
+        if not self.rate:
+            return None
+        now = self.lastTs if now is None else now
+        idle = now-self.anchorTs
+        if idle*abs(self.rate) > 1:
+            return 1/idle if self.rate > 0 else -1/idle
+        return self.rate
+
+    def timeRemaining(self, now=None, full=100):
+        if (rate := self.currentRate(now)) is None:
+            return None
+        target = full if rate > 0 else 0
+        return max((target-self.lastPer)/rate, 0)
+
+    def describe(self, now=None, full=100) -> str:
+        remaining = self.timeRemaining(now, full)
+        if remaining is None:
+            return ''
+        if self.rate > 0:
+            return f'{formatDuration(remaining)} until full' if remaining else ''
+        return f'{formatDuration(remaining)} remaining'
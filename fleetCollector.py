@@ -0,0 +1,211 @@
+import argparse
+import json
+import os
+import re
+import select
+import socket
+import time
+from datetime import date as Date, datetime
+from pathlib import Path
+
+
+PROTOCOL = b'PTC1'
+HOST_PATTERN = re.compile(r'[A-Za-z0-9._-]{1,64}')
+BATCH_SIZE = 5000
+FLUSH_DELAY = 1.0
+
+
+def encode(host, ts, per, pluggedIn, state='') -> bytes:
+    return b' '.join((PROTOCOL, host.encode(), b'%d' % ts, b'%d' % per, b'+' if pluggedIn else b'-', (state or '-').encode()))
+
+def decode(data: bytes):
+    parts = data.split()
+    if len(parts) != 6 or parts[0] != PROTOCOL:
+        return None
+    try:
+        host = parts[1].decode()
+        if not HOST_PATTERN.fullmatch(host) or host in ('.', '..'):
+            return None
+        return host, int(parts[2]), int(parts[3]), parts[4] == b'+', parts[5].decode()
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+def parseAddress(address: str):
+    if address.startswith('unix://'):
+        return socket.AF_UNIX, address[len('unix://'):]
+    host, _, port = address.removeprefix('udp://').rpartition(':')
+    return socket.AF_INET, (host or '127.0.0.1', int(port))
+
+
+class FleetSink:
+    def __init__(self, address: str, host=None) -> None:
+        self.family, self.address = parseAddress(address)
+        self.host = (host or socket.gethostname()).replace(' ', '_')
+        self.sock = socket.socket(self.family, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.sent = self.dropped = 0
+
+    def send(self, per, pluggedIn, state='', ts=None):
+        try:
+            self.sock.sendto(encode(self.host, int(ts or time.time()), per, pluggedIn, state), self.address)
+            self.sent += 1
+        except OSError:
+            self.dropped += 1
+
+    def close(self):
+        self.sock.close()
+
+
+class Collector:
+    def __init__(self, folder, address: str) -> None:
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.family, self.address = parseAddress(address)
+        if self.family == socket.AF_UNIX and os.path.exists(self.address):
+            os.unlink(self.address)
+        self.sock = socket.socket(self.family, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4*1024*1024)
+        self.sock.bind(self.address)
+        self.sock.setblocking(False)
+        self.pending = {}
+        self.pendingCount = 0
+        self.summaries = {}
+        self.received = self.rejected = self.writeErrors = 0
+        self.lastFlush = time.monotonic()
+
+    def ingest(self, data: bytes):
+        sample = decode(data)
+        if sample is None:
+            self.rejected += 1
+            return
+        host, ts, per, pluggedIn, state = sample
+        day = str(datetime.fromtimestamp(ts).date())
+        self.pending.setdefault((host, day), []).append(f"{ts},{per},{'+' if pluggedIn else '-'},{state}\n")
+        self.pendingCount += 1
+        self.received += 1
+
+        summary = self.summary(day).setdefault(host, {'samples': 0, 'min': per, 'max': per, 'last': per, 'lastTs': ts, 'states': {}})
+        summary['samples'] += 1
+        summary['min'], summary['max'] = min(summary['min'], per), max(summary['max'], per)
+        if ts >= summary['lastTs']:
+            summary['last'], summary['lastTs'] = per, ts
+        summary['states'][state] = summary['states'].get(state, 0)+1
+
+    def summary(self, day) -> dict:
+        if day not in self.summaries:
+            self.summaries[day] = loadSummary(self.folder, day)
+        return self.summaries[day]
+
+    def poll(self, timeout):
+        ready, _, _ = select.select([self.sock], [], [], timeout)
+        if ready:
+            while True:
+                try:
+                    self.ingest(self.sock.recv(512))
+                except BlockingIOError:
+                    break
+        if self.pendingCount >= BATCH_SIZE or time.monotonic()-self.lastFlush >= FLUSH_DELAY:
+            self.flush()
+
+    def flush(self):
+        for (host, day), lines in self.pending.items():
+            try:
+                hostFolder = self.folder/host
+                hostFolder.mkdir(exist_ok=True)
+                with open(hostFolder/(day+'.log'), 'a') as file:
+                    file.writelines(lines)
+            except OSError:
+                self.writeErrors += 1
+        for day in {day for _, day in self.pending}:
+            path = self.folder/f'summary-{day}.json'
+            try:
+                path.with_suffix('.tmp').write_text(json.dumps(self.summaries[day]))
+                os.replace(path.with_suffix('.tmp'), path)
+            except OSError:
+                self.writeErrors += 1
+        self.pending.clear()
+        self.pendingCount = 0
+        self.lastFlush = time.monotonic()
+
+    def serve(self, duration=None):
+        end = None if duration is None else time.monotonic()+duration
+        try:
+            while end is None or time.monotonic() < end:
+                self.poll(FLUSH_DELAY)
+        finally:
+            self.flush()
+
+    def close(self):
+        self.flush()
+        self.sock.close()
+        if self.family == socket.AF_UNIX and os.path.exists(self.address):
+            os.unlink(self.address)
+
+
+def loadSummary(folder, day) -> dict:
+    try:
+        return json.loads((Path(folder)/f'summary-{day}.json').read_text())
+    except (OSError, ValueError):
+        return {}
+
+def hostsWithState(folder, day, state='Critical') -> list:
+    return sorted(host for host, s in loadSummary(folder, day).items() if s['states'].get(state))
+
+
+def loadTest(address, senders=300, seconds=5.0, rate=10.0):
+    sinks = [FleetSink(address, host=f'sim-{i:04}') for i in range(senders)]
+    interval = 1/(rate*senders)
+    start = time.monotonic()
+    sent, per = 0, 100
+    while (elapsed := time.monotonic()-start) < seconds:
+        sink = sinks[sent % senders]
+        per = (per-1) % 101
+        sink.send(per, per % 7 == 0, 'Critical' if per < 10 else 'Normal')
+        sent += 1
+        if (wait := sent*interval-elapsed) > 0:
+            time.sleep(wait)
+    dropped = sum(s.dropped for s in sinks)
+    for sink in sinks:
+        sink.close()
+    return sent, dropped, time.monotonic()-start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Power TrayCon fleet collector')
+    parser.add_argument('--folder', default='fleet', help='storage folder (default: fleet)')
+    parser.add_argument('--address', default='udp://127.0.0.1:47800', help='udp://host:port or unix:///path')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('serve')
+    query = sub.add_parser('query')
+    query.add_argument('state', nargs='?', default='Critical')
+    query.add_argument('--date', default=str(Date.today()))
+    load = sub.add_parser('loadtest')
+    load.add_argument('--senders', type=int, default=300)
+    load.add_argument('--seconds', type=float, default=5.0)
+    load.add_argument('--rate', type=float, default=10.0, help='samples per second per sender')
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        collector = Collector(args.folder, args.address)
+        try:
+            collector.serve()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            collector.close()
+    elif args.command == 'query':
+        for host in hostsWithState(args.folder, args.date, args.state):
+            print(host)
+    else:
+        import threading
+        collector = Collector(args.folder, args.address)
+        thread = threading.Thread(target=collector.serve, args=(args.seconds+1.5,))
+        thread.start()
+        sent, dropped, elapsed = loadTest(args.address, args.senders, args.seconds, args.rate)
+        thread.join()
+        collector.close()
+        print(f'sent {sent} ({sent/elapsed:.0f}/s), send errors {dropped}, stored {collector.received}, rejected {collector.rejected}, write errors {collector.writeErrors}, lost {sent-dropped-collector.received}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+import gzip
+import heapq
+import json
+import lzma
+import os
+import time
+from datetime import date as Date, datetime, timedelta
+from pathlib import Path
+
+import historyBinary
+
+
+CODECS = {'xz': ('.xz', lzma.open), 'gz': ('.gz', gzip.open)}
+
+
+def dayFiles(folder: Path) -> dict:
+    files = {}
+    for suffix in (historyBinary.CSV_SUFFIX, historyBinary.SUFFIX):
+        for path in Path(folder).glob('*'+suffix):
+            files.setdefault(historyBinary.dateOf(path), []).append(path)
+    return files
+
+def readDayFile(path: Path):
+    if path.name.endswith(historyBinary.SUFFIX):
+        for ts, per, plugged in historyBinary.readDay(path):
+            yield int(ts), int(per), bool(plugged)
+    else:
+        yield from historyBinary.readCsv(path)
+
+def readDayRows(paths):
+    rows = [row for path in paths for row in readDayFile(path)]
+    rows.sort()
+    return rows
+
+
+class HistoryArchive:
+    metaName = 'archives.json'
+
+    def __init__(self, folder, codec='xz', archiveAfterDays=7, retentionDays=0) -> None:
+        self.folder = Path(folder)
+        self.suffix, self.opener = CODECS.get(codec, CODECS['xz'])
+        self.archiveAfterDays = max(archiveAfterDays, 1)
+        self.retentionDays = retentionDays
+        self.metaPath = self.folder/self.metaName
+        self.meta = self.loadMeta()
+
+    def loadMeta(self) -> dict:
+        try:
+            return json.loads(self.metaPath.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def saveMeta(self):
+        tmp = self.metaPath.with_suffix('.tmp')
+        tmp.write_text(json.dumps(self.meta))
+        os.replace(tmp, self.metaPath)
+
+    def archivePath(self, month) -> Path:
+        return self.folder/f'{month}-ptc.csv{self.suffix}'
+
+    def archives(self):
+        return sorted(p for codecSuffix, _ in CODECS.values() for p in self.folder.glob(f'*-ptc.csv{codecSuffix}'))
+
+    def _open(self, path: Path, mode):
+        for codecSuffix, opener in CODECS.values():
+            if path.name.endswith(codecSuffix):
+                return opener(path, mode)
+        raise ValueError(path)
+
+    def pendingDays(self, today=None):
+        cutoff = str((today or Date.today())-timedelta(days=self.archiveAfterDays))
+        return sorted(day for day in dayFiles(self.folder) if day < cutoff)
+
+    def expiredArchives(self, today=None):
+        if not self.retentionDays:
+            return []
+        cutoff = str((today or Date.today())-timedelta(days=self.retentionDays))
+        return [p for p in self.archives() if self.meta.get(p.name[:7], [cutoff])[-1] < cutoff]
+
+    def compactDay(self, day):
+        month = day[:7]
+        paths = dayFiles(self.folder).get(day, [])
+        archived = self.meta.setdefault(month, [])
+        if day not in archived:
+            path = self.archivePath(month)
+            rows = readDayRows(paths)
+            if archived and day < archived[-1]:
+                rows = sorted(list(self.iterArchive(path))+rows)
+                tmp = path.with_name(path.name+'.tmp')
+                with self._open(tmp, 'wt') as file:
+                    file.writelines(f"{ts},{'+' if plugged else '-'}{per}\n" for ts, per, plugged in rows)
+                os.replace(tmp, path)
+            else:
+                with self._open(path, 'at') as file:
+                    file.writelines(f"{ts},{'+' if plugged else '-'}{per}\n" for ts, per, plugged in rows)
+            archived.append(day)
+            archived.sort()
+            self.saveMeta()
+        for path in paths:
+            path.unlink()
+
+    def step(self, today=None) -> bool:
+        if expired := self.expiredArchives(today):
+            expired[0].unlink()
+            self.meta.pop(expired[0].name[:7], None)
+            self.saveMeta()
+            return True
+        if days := self.pendingDays(today):
+            cutoff = str((today or Date.today())-timedelta(days=self.retentionDays)) if self.retentionDays else ''
+            if days[0] < cutoff:
+                for path in dayFiles(self.folder)[days[0]]:
+                    path.unlink()
+            else:
+                self.compactDay(days[0])
+            return len(days) > 1
+        return False
+
+    def firstDay(self):
+        days = sorted(dayFiles(self.folder))+[min(self.meta[p.name[:7]]) for p in self.archives() if self.meta.get(p.name[:7])]
+        return min(days, default=None)
+
+    def iterArchive(self, path: Path):
+        with self._open(path, 'rt') as file:
+            for line in file:
+                ts, _, value = line.strip().partition(',')
+                if value:
+                    yield int(ts), abs(int(value)), value.startswith('+')
+
+    def iterSamples(self, start=None, end=None):
+        start = 0 if start is None else int(start)
+        end = float('inf') if end is None else int(end)
+        startMonth = datetime.fromtimestamp(start).strftime('%Y-%m') if start else ''
+        endDay = str(datetime.fromtimestamp(end).date()) if end != float('inf') else '9999'
+
+        sources = [self.iterArchive(p) for p in self.archives() if startMonth <= p.name[:7] <= endDay[:7]]
+        live = sorted((day, paths) for day, paths in dayFiles(self.folder).items() if startMonth <= day[:7] and day <= endDay)
+        sources.append(row for _, paths in live for row in readDayRows(paths))
+        for row in heapq.merge(*sources):
+            if row[0] > end:
+                break
+            if row[0] >= start:
+                yield row
+
+
+def iterSamples(folder, start=None, end=None):
+    return HistoryArchive(folder).iterSamples(start, end)
+
+
+if __name__ == '__main__':
+    import sys
+    archive = HistoryArchive(sys.argv[1] if len(sys.argv) > 1 else 'data/history')
+    steps = 0
+    begin = time.perf_counter()
+    while archive.step():
+        steps += 1
+    print(f'{steps+1} compaction steps in {time.perf_counter()-begin:.2f} s')
@@ -0,0 +1,133 @@
+import mmap
+import struct
+import time
+from array import array
+from csv import reader as csvReader, writer as csvWriter
+from datetime import datetime
+from functools import lru_cache
+from importlib.util import find_spec
+from pathlib import Path
+
+
+RECORD = struct.Struct('<qBB')
+SUFFIX = '-ptc.bin'
+CSV_SUFFIX = '-ptc.csv'
+
+
+@lru_cache(maxsize=None)
+def numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+def hasNumpy() -> bool:
+    return find_spec('numpy') is not None
+
+@lru_cache(maxsize=None)
+def recordDtype():
+    return numpy().dtype([('t', '<i8'), ('per', 'u1'), ('plugged', 'u1')])
+
+
+class BinaryFormat:
+    suffix = SUFFIX
+    mode = 'ab'
+    newline = None
+
+    def __init__(self, file) -> None:
+        self.file = file
+
+    def writeRows(self, rows):
+        buf = bytearray(RECORD.size*len(rows))
+        for i, (when, per, pluggedIn) in enumerate(rows):
+            RECORD.pack_into(buf, i*RECORD.size, int(when.timestamp()), max(min(per, 255), 0), bool(pluggedIn))
+        self.file.write(buf)
+
+
+def dateOf(path: Path) -> str:
+    return path.name[:10]
+
+def parseCsvRow(date: str, row) -> tuple:
+    t, value = row
+    ts = int(time.mktime(time.strptime(f'{date} {t}', '%Y-%m-%d %H:%M:%S')))
+    return ts, abs(int(value)), value.startswith('+')
+
+def readCsv(path: Path):
+    date = dateOf(path)
+    with open(path, newline='') as file:
+        for row in csvReader(file):
+            try:
+                yield parseCsvRow(date, row)
+            except ValueError:
+                continue
+
+def readDay(path: Path):
+    path = Path(path)
+    size = path.stat().st_size
+    count = size//RECORD.size
+    if (np := numpy()) is None:
+        with open(path, 'rb') as file:
+            return list(RECORD.iter_unpack(file.read(count*RECORD.size)))
+    if not count:
+        return np.empty(0, dtype=recordDtype())
+    with open(path, 'rb') as file:
+        mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    return np.frombuffer(mm, dtype=recordDtype(), count=count)
+
+def csvToBinary(csvPath: Path, binPath: Path=None) -> Path:
+    csvPath = Path(csvPath)
+    binPath = Path(binPath or csvPath.with_name(dateOf(csvPath)+SUFFIX))
+    ts, per, plugged = array('q'), array('B'), array('B')
+    for t, p, pl in readCsv(csvPath):
+        ts.append(t); per.append(p); plugged.append(pl)
+    buf = bytearray(RECORD.size*len(ts))
+    for i in range(len(ts)):
+        RECORD.pack_into(buf, i*RECORD.size, ts[i], per[i], plugged[i])
+    tmp = binPath.with_suffix('.tmp')
+    tmp.write_bytes(buf)
+    tmp.replace(binPath)
+    return binPath
+
+def binaryToCsv(binPath: Path, csvPath: Path=None) -> Path:
+    binPath = Path(binPath)
+    csvPath = Path(csvPath or binPath.with_name(dateOf(binPath)+CSV_SUFFIX))
+    with open(binPath, 'rb') as file:
+        data = file.read()
+    with open(csvPath, 'w', newline='') as file:
+        writer = csvWriter(file)
+        for ts, per, plugged in RECORD.iter_unpack(data[:len(data)//RECORD.size*RECORD.size]):
+            writer.writerow((datetime.fromtimestamp(ts).strftime('%H:%M:%S'), f"{'+'if plugged else '-'}{per}"))
+    return csvPath
+
+def convertFolder(folder: Path, removeCsv=False) -> list:
+    converted = []
+    for csvPath in sorted(Path(folder).glob('*'+CSV_SUFFIX)):
+        binPath = csvPath.with_name(dateOf(csvPath)+SUFFIX)
+        if binPath.exists() and binPath.stat().st_mtime >= csvPath.stat().st_mtime:
+            continue
+        converted.append(csvToBinary(csvPath, binPath))
+        if removeCsv:
+            csvPath.unlink()
+    return converted
+
+def exportFolder(folder: Path, target: Path=None) -> Path:
+    folder = Path(folder)
+    target = Path(target or folder/'export')
+    target.mkdir(parents=True, exist_ok=True)
+    for binPath in sorted(folder.glob('*'+SUFFIX)):
+        csvPath = target/(dateOf(binPath)+CSV_SUFFIX)
+        if csvPath.exists() and csvPath.stat().st_mtime >= binPath.stat().st_mtime:
+            continue
+        binaryToCsv(binPath, csvPath)
+    return target
+
+if __name__ == '__main__':
+    import sys
+    command, folder = (sys.argv[1:3]+['data/history'])[:2] if len(sys.argv) > 1 else ('convert', 'data/history')
+    if command == 'convert':
+        print(f'{len(convertFolder(folder))} day files converted')
+    elif command == 'export':
+        print(exportFolder(folder))
+    else:
+        sys.exit('usage: historyBinary.py convert|export [folder]')
@@ -0,0 +1,296 @@
+import json
+import os
+import threading
+import time
+from datetime import date as Date, datetime
+from pathlib import Path
+
+import historyBinary
+from historyArchive import HistoryArchive
+from historyBinary import numpy
+
+
+MAX_GAP = 600
+PERIODS = {'hour': 3600, 'day': 86400}
+
+
+def newEntry():
+    return {'rows': 0, 'first': None, 'last': None, 'min': None, 'max': None, 'sum': 0,
+            'transitions': 0, 'plugged': None, 'pluggedSecs': 0, 'batterySecs': 0, 'size': 0}
+
+def addSample(entry: dict, ts: int, per: int, plugged: bool):
+    if entry['rows']:
+        gap = min(max(ts-entry['last'], 0), MAX_GAP)
+        entry['pluggedSecs' if entry['plugged'] else 'batterySecs'] += gap
+        entry['transitions'] += entry['plugged'] != plugged
+        entry['min'], entry['max'] = min(entry['min'], per), max(entry['max'], per)
+    else:
+        entry['first'] = ts
+        entry['min'] = entry['max'] = per
+    entry['rows'] += 1
+    entry['sum'] += per
+    entry['last'] = ts
+    entry['plugged'] = plugged
+
+def summarize(t, per, plugged) -> dict:
+    entry = newEntry()
+    if not len(t):
+        return entry
+    np = numpy()
+    gaps = np.clip(np.diff(t), 0, MAX_GAP)
+    plugged = plugged.astype(bool)
+    entry.update(rows=int(len(t)), first=int(t[0]), last=int(t[-1]), min=int(per.min()), max=int(per.max()),
+                 sum=int(per.sum(dtype=np.int64)), transitions=int(np.count_nonzero(plugged[1:] != plugged[:-1])),
+                 plugged=bool(plugged[-1]), pluggedSecs=int(gaps[plugged[:-1]].sum()), batterySecs=int(gaps[~plugged[:-1]].sum()))
+    return entry
+
+
+def dayFile(folder: Path, date: str) -> Path:
+    binPath = folder/(date+historyBinary.SUFFIX)
+    return binPath if binPath.exists() else folder/(date+historyBinary.CSV_SUFFIX)
+
+def loadDay(path: Path):
+    if path.name.endswith(historyBinary.SUFFIX):
+        data = historyBinary.readDay(path)
+        return data['t'], data['per'], data['plugged']
+    rows = list(historyBinary.readCsv(path))
+    if not rows:
+        return emptyDay()
+    t, per, plugged = zip(*rows)
+    np = numpy()
+    return np.array(t, np.int64), np.array(per, np.uint8), np.array(plugged, np.uint8)
+
+def emptyDay():
+    np = numpy()
+    return np.empty(0, np.int64), np.empty(0, np.uint8), np.empty(0, np.uint8)
+
+def loadArchive(path: Path) -> dict:
+    days = {}
+    for ts, per, plugged in HistoryArchive(path.parent).iterArchive(path):
+        days.setdefault(str(datetime.fromtimestamp(ts).date()), []).append((ts, per, plugged))
+    np = numpy()
+    return {day: (np.array(t, np.int64), np.array(per, np.uint8), np.array(plugged, np.uint8)) for day, (t, per, plugged) in
+            ((day, zip(*rows)) for day, rows in days.items())}
+
+def midnight(date: str) -> int:
+    return int(datetime.fromisoformat(date).timestamp())
+
+def utcOffsets(t):
+    np = numpy()
+    hours, inverse = np.unique(t//3600, return_inverse=True)
+    return np.array([time.localtime(int(h)*3600).tm_gmtoff for h in hours], np.int64)[inverse]
+
+def lttb(x, y, threshold: int):
+    n, np = len(x), numpy()
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    every = (n-2)/(threshold-2)
+    idx = np.empty(threshold, dtype=np.int64)
+    idx[0], idx[-1] = 0, n-1
+    a = 0
+    for i in range(threshold-2):
+        start, stop = int(i*every)+1, int((i+1)*every)+1
+        nextStop = min(int((i+2)*every)+1, n)
+        if nextStop > stop:
+            avgX, avgY = x[stop:nextStop].mean(), y[stop:nextStop].mean()
+        else:
+            avgX, avgY = x[-1], y[-1]
+        area = np.abs((x[a]-avgX)*(y[start:stop]-y[a]) - (x[a]-x[start:stop])*(avgY-y[a]))
+        a = start+int(area.argmax())
+        idx[i+1] = a
+    return idx
+
+
+class DayIndex:
+    fileName = 'index.json'
+
+    def __init__(self, folder) -> None:
+        self.folder = Path(folder)
+        self.path = self.folder/self.fileName
+        self.lock = threading.Lock()
+        self.days = self.load()
+        self.archiveCache = (None, None, {})
+
+    def load(self) -> dict:
+        try:
+            with open(self.path) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        with self.lock:
+            data = json.dumps(self.days)
+        tmp = self.path.with_suffix('.tmp')
+        with open(tmp, 'w') as file:
+            file.write(data)
+        os.replace(tmp, self.path)
+
+    def addRows(self, date, rows, before:int, after:int):
+        with self.lock:
+            entry = self.days.setdefault(str(date), newEntry())
+            if entry['size'] != before:
+                entry['size'] = -1
+                return
+            for when, per, pluggedIn in rows:
+                addSample(entry, int(when.timestamp()), per, bool(pluggedIn))
+            entry['size'] = after
+
+    def dayFiles(self):
+        files = {}
+        for suffix in (historyBinary.CSV_SUFFIX, historyBinary.SUFFIX):
+            for path in self.folder.glob('*'+suffix):
+                files[historyBinary.dateOf(path)] = path
+        return files
+
+    def archivedDays(self):
+        archive = HistoryArchive(self.folder)
+        return {day: path for path in archive.archives() for day in archive.meta.get(path.name[:7], [])}
+
+    def refresh(self) -> bool:
+        changed = False
+        files = self.dayFiles()
+        archived = {day: path for day, path in self.archivedDays().items() if day not in files}
+        for date in set(self.days)-set(files)-set(archived):
+            with self.lock:
+                del self.days[date]
+            changed = True
+        for date, path in files.items():
+            entry = self.days.get(date)
+            if entry is None or entry.get('archive') or entry['size'] != path.stat().st_size:
+                self.rebuild(date, path)
+                changed = True
+        stale = {}
+        for date, path in archived.items():
+            if self.days.get(date, {}).get('archive') != path.name:
+                stale.setdefault(path, []).append(date)
+        for path, dates in stale.items():
+            days = loadArchive(path)
+            for date in dates:
+                entry = summarize(*days.get(date, emptyDay()))
+                entry.update(size=-1, archive=path.name)
+                with self.lock:
+                    self.days[date] = entry
+            changed = True
+        if changed:
+            self.save()
+        return changed
+
+    def loadDay(self, date):
+        path = dayFile(self.folder, date)
+        if path.exists():
+            return loadDay(path)
+        if not (self.folder/self.days.get(date, {}).get('archive', '')).is_file():
+            self.refresh()
+        if not (name := self.days.get(date, {}).get('archive')):
+            return emptyDay()
+        archive = self.folder/name
+        mtime = archive.stat().st_mtime_ns
+        if self.archiveCache[:2] != (name, mtime):
+            self.archiveCache = (name, mtime, loadArchive(archive))
+        return self.archiveCache[2].get(date, emptyDay())
+
+    def rebuild(self, date, path=None):
+        path = path or dayFile(self.folder, date)
+        entry = summarize(*loadDay(path))
+        entry['size'] = path.stat().st_size
+        with self.lock:
+            self.days[date] = entry
+
+    def between(self, start:int, end:int):
+        with self.lock:
+            return sorted(d for d, e in self.days.items() if e['rows'] and e['first'] <= end and e['last'] >= start)
+
+
+class HistoryQuery:
+    def __init__(self, folder, index:DayIndex=None) -> None:
+        if numpy() is None:
+            raise RuntimeError('history queries require NumPy')
+        self.folder = Path(folder)
+        self.index = index or DayIndex(folder)
+        self.index.refresh()
+
+    @staticmethod
+    def _ts(when) -> int:
+        if isinstance(when, Date) and not isinstance(when, datetime):
+            when = datetime.combine(when, datetime.min.time())
+        return int(when.timestamp()) if isinstance(when, datetime) else int(when)
+
+    def _covers(self, date, start, end) -> bool:
+        entry = self.index.days[date]
+        return start <= entry['first'] and entry['last'] <= end
+
+    def samples(self, start, end):
+        start, end = self._ts(start), self._ts(end)
+        parts = [self.index.loadDay(d) for d in self.index.between(start, end)]
+        if not parts:
+            return emptyDay()
+        np = numpy()
+        t, per, plugged = (np.concatenate(p) for p in zip(*parts))
+        mask = (t >= start) & (t <= end)
+        return t[mask], per[mask], plugged[mask]
+
+    def aggregate(self, start, end, period='hour'):
+        start, end = self._ts(start), self._ts(end)
+        size = PERIODS[period]
+        result = {}
+        np = numpy()
+        for date in self.index.between(start, end):
+            if period == 'day' and self._covers(date, start, end):
+                e = self.index.days[date]
+                result[midnight(date)] = (e['min'], e['max'], e['sum']/e['rows'], e['rows'])
+                continue
+
+            t, per, _ = self.index.loadDay(date)
+            mask = (t >= start) & (t <= end)
+            t, per = t[mask], per[mask].astype(np.int64)
+            if not len(t):
+                continue
+            if period == 'day':
+                result[midnight(date)] = (int(per.min()), int(per.max()), float(per.mean()), len(t))
+                continue
+            order = np.argsort(t, kind='stable')
+            t, per = t[order], per[order]
+            offsets = utcOffsets(t)
+            keys = (t+offsets)//size*size-offsets
+            starts = np.concatenate(([0], np.flatnonzero(np.diff(keys))+1))
+            counts = np.diff(np.append(starts, len(t)))
+            mins, maxs = np.minimum.reduceat(per, starts), np.maximum.reduceat(per, starts)
+            means = np.add.reduceat(per, starts)/counts
+            for k, mn, mx, mean, n in zip(keys[starts], mins, maxs, means, counts):
+                result[int(k)] = (int(mn), int(mx), float(mean), int(n))
+
+        return sorted(result.items())
+
+    def pluggedTime(self, start, end) -> dict:
+        start, end = self._ts(start), self._ts(end)
+        total = {'plugged': 0, 'battery': 0}
+        partial = []
+        for date in self.index.between(start, end):
+            if self._covers(date, start, end):
+                total['plugged'] += self.index.days[date]['pluggedSecs']
+                total['battery'] += self.index.days[date]['batterySecs']
+            else:
+                partial.append(date)
+        np = numpy()
+        for date in partial:
+            t, _, plugged = self.index.loadDay(date)
+            mask = (t >= start) & (t <= end)
+            if np.count_nonzero(mask) < 2:
+                continue
+            entry = summarize(t[mask], np.zeros(np.count_nonzero(mask), np.uint8), plugged[mask])
+            total['plugged'] += entry['pluggedSecs']
+            total['battery'] += entry['batterySecs']
+        return total
+
+if __name__ == '__main__':
+    import sys
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 7
+    folder = sys.argv[2] if len(sys.argv) > 2 else 'data/history'
+    end = time.time()
+    query = HistoryQuery(folder)
+    for ts, (mn, mx, mean, n) in query.aggregate(end-days*86400, end, 'day'):
+        print(f'{datetime.fromtimestamp(ts).date()}  min {mn:3}%  max {mx:3}%  mean {mean:5.1f}%  samples {n}')
+    plugged = query.pluggedTime(end-days*86400, end)
+    print(f"plugged in {plugged['plugged']/3600:.1f} h, on battery {plugged['battery']/3600:.1f} h")
@@ -0,0 +1,152 @@
+import os
+import queue
+import threading
+import time
+from csv import writer as csvWriter
+from datetime import datetime
+from pathlib import Path
+from historyBinary import BinaryFormat
+from historyQuery import DayIndex
+
+
+class CsvFormat:
+    suffix = '-ptc.csv'
+    mode = 'a+'
+    newline = ''
+
+    def __init__(self, file) -> None:
+        self.writer = csvWriter(file)
+
+    def writeRows(self, rows):
+        self.writer.writerows((when.strftime('%H:%M:%S'), f"{'+'if pluggedIn else '-'}{per}") for when, per, pluggedIn in rows)
+
+
+class HistoryWriter:
+    FSYNC_NEVER = 'never'
+    FSYNC_ROTATE = 'rotate'
+    FSYNC_FLUSH = 'flush'
+
+    FORMATS = {'csv': CsvFormat, 'bin': BinaryFormat}
+
+    _FLUSH = object()
+    _STOP = object()
+
+    def __init__(self, folder, batchSize=32, maxAge=60.0, fsync=FSYNC_ROTATE, format='csv', index=True, maxPending=86400) -> None:
+        self.folder = Path(folder)
+        self.format = self.FORMATS.get(format, CsvFormat)
+        self.batchSize = batchSize
+        self.maxAge = maxAge
+        self.fsync = fsync
+        self.maxPending = maxPending
+        self.index = DayIndex(self.folder) if index else None
+        self.file = None
+        self.date = None
+        self.rowsWritten = self.flushes = 0
+        self.errors = self.dropped = 0
+        self.lastError = ''
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name='HistoryWriter', daemon=True)
+        self.thread.start()
+
+    def fileFor(self, date) -> Path:
+        return self.folder/(str(date)+self.format.suffix)
+
+    def append(self, per, pluggedIn:bool, when:datetime=None):
+        self.queue.put((when or datetime.now(), per, pluggedIn))
+
+    def flush(self):
+        self.queue.put(self._FLUSH)
+
+    def close(self):
+        if self.thread.is_alive():
+            self.queue.put(self._STOP)
+            self.thread.join()
+
+    def _run(self):
+        pending = []
+        oldest = 0.0
+        while True:
+            timeout = max(self.maxAge-(time.monotonic()-oldest), 0) if pending and self.maxAge is not None else None
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = self._FLUSH
+
+            if item is self._STOP:
+                self.dropped += len(self._write(pending))
+                try:
+                    self._closeFile()
+                except OSError as e:
+                    self._failed(e)
+                return
+            if item is not self._FLUSH:
+                if not pending:
+                    oldest = time.monotonic()
+                pending.append(item)
+                if len(pending) < self.batchSize:
+                    continue
+            pending = self._retry(pending)
+            oldest = time.monotonic()
+
+    def _retry(self, rows):
+        rows = self._write(rows)
+        if len(rows) > self.maxPending:
+            self.dropped += len(rows)-self.maxPending
+            del rows[:-self.maxPending]
+        return rows
+
+    def _write(self, rows):
+        if not rows:
+            return []
+        start = 0
+        try:
+            for i, (when, _, _) in enumerate(rows):
+                if when.date() != self.date:
+                    if i > start:
+                        self._writeSegment(rows[start:i])
+                    start = i
+                    self._rotate(when.date())
+            self._writeSegment(rows[start:])
+            start = len(rows)
+            if self.fsync == self.FSYNC_FLUSH:
+                os.fsync(self.file.fileno())
+            if self.index:
+                self.index.save()
+        except OSError as e:
+            self._failed(e)
+        self.rowsWritten += start
+        self.flushes += 1
+        return rows[start:]
+
+    def _failed(self, error):
+        self.errors += 1
+        self.lastError = str(error)
+        if self.file is not None:
+            try:
+                self.file.close()
+            except OSError:
+                pass
+        self.file = self.date = None
+
+    def _writeSegment(self, rows):
+        before = self.file.tell()
+        self.writer.writeRows(rows)
+        self.file.flush()
+        if self.index:
+            self.index.addRows(self.date, rows, before, self.file.tell())
+
+    def _rotate(self, date):
+        self._closeFile()
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.file = open(self.fileFor(date), self.format.mode, newline=self.format.newline)
+        self.writer = self.format(self.file)
+        self.date = date
+
+    def _closeFile(self):
+        if self.file is None:
+            return
+        self.file.flush()
+        if self.fsync != self.FSYNC_NEVER:
+            os.fsync(self.file.fileno())
+        self.file.close()
+        self.file = self.date = None
@@ -0,0 +1,99 @@
+import time
+from collections import OrderedDict
+
+from PyQt5.QtCore import Qt, QRectF, QTimer
+from PyQt5.QtGui import QIcon, QPixmap, QColor, QFont, QPainter
+from PyQt5.QtWidgets import QApplication
+
+from ptcCore import Setting, settingChangedHooks, getFontWeightL
+
+
+class IconRenderer:
+    fontMembers = (Setting.FontFamily, Setting.FontSize, Setting.FontWeight)
+    viewBox = 20
+
+    def __init__(self, maxSize=256, iconSize=32):
+        self.cache = OrderedDict()
+        self.maxSize = maxSize
+        self.iconSize = iconSize
+        self.hits = self.renders = 0
+        self.renderTime = 0.0
+        self._font = None
+        self._warmQueue = []
+        settingChangedHooks.append(self._onSettingChanged)
+
+    def _onSettingChanged(self, mem:Setting):
+        if mem in self.fontMembers or mem.name.endswith('Color'):
+            self.invalidate()
+
+    def invalidate(self):
+        self.cache.clear()
+        self._font = None
+
+    def font(self):
+        if self._font is None:
+            font = QFont(Setting.FontFamily.v)
+            font.setPixelSize(int(Setting.FontSize.getValidValue(int)*1.33333333333)+1)
+            font.setWeight(QFont.Bold if getFontWeightL(Setting.FontWeight.getValidValue(int)) == 'bold' else QFont.Normal)
+            self._font = font
+        return self._font
+
+    @staticmethod
+    def devicePixelRatio():
+        app = QApplication.instance()
+        return app.devicePixelRatio() if app else 1.0
+
+    def icon(self, color:str, per:int, dpr=None) -> QIcon:
+        dpr = dpr or self.devicePixelRatio()
+        font = self.font()
+        key = (color, min(per, 100), font.family(), font.pixelSize(), font.weight(), dpr)
+        if (icon:=self.cache.get(key)) is not None:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return icon
+
+        icon = self.render(color, per, dpr)
+        self.cache[key] = icon
+        if len(self.cache) > self.maxSize:
+            self.cache.popitem(last=False)
+        return icon
+
+    def render(self, color:str, per:int, dpr=1.0) -> QIcon:
+        start = time.perf_counter()
+        if per >= 100:
+            icon = QIcon(":immiApplication/icon/fullBattery.svg")
+        else:
+            pixmap = QPixmap(int(self.iconSize*dpr), int(self.iconSize*dpr))
+            pixmap.setDevicePixelRatio(dpr)
+            pixmap.fill(Qt.transparent)
+            painter = QPainter(pixmap)
+            painter.setRenderHints(QPainter.Antialiasing|QPainter.TextAntialiasing)
+            painter.scale(self.iconSize/self.viewBox, self.iconSize/self.viewBox)
+            painter.setFont(self.font())
+            painter.setPen(QColor(color))
+            painter.drawText(QRectF(-self.viewBox, 0, self.viewBox*3, self.viewBox), Qt.AlignCenter, str(per))
+            painter.end()
+            icon = QIcon(pixmap)
+        self.renders += 1
+        self.renderTime += time.perf_counter()-start
+        return icon
+
+    def prewarm(self, colors, chunk=10):
+        self._warmQueue = [(c, per) for c in colors for per in range(101)]
+        self.maxSize = max(self.maxSize, len(self._warmQueue))
+        self._warmStep(chunk)
+
+    def _warmStep(self, chunk):
+        for color, per in self._warmQueue[:chunk]:
+            self.icon(color, per)
+        del self._warmQueue[:chunk]
+        if self._warmQueue:
+            QTimer.singleShot(0, lambda:self._warmStep(chunk))
+
+    def stats(self):
+        return {
+            'cached': len(self.cache),
+            'hits': self.hits,
+            'renders': self.renders,
+            'avgRenderMs': self.renderTime*1000/self.renders if self.renders else 0.0,
+        }
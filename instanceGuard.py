@@ -0,0 +1,88 @@
+import getpass
+import os
+import sys
+
+from PyQt5.QtCore import QObject, QLockFile, QDir, QCoreApplication
+from PyQt5.QtNetwork import QLocalServer, QLocalSocket
+
+
+APP_NAME = 'PowerTrayCon'
+TIMEOUT = 1000
+
+
+def serverName(name=APP_NAME):
+    return f'{name}-{getpass.getuser()}'
+
+
+class InstanceGuard(QObject):
+    def __init__(self, name=APP_NAME, parent=None):
+        super().__init__(parent)
+        self.name = serverName(name)
+        self.lock = QLockFile(os.path.join(QDir.tempPath(), self.name+'.lock'))
+        self.lock.setStaleLockTime(0)
+        self.server = None
+        self.handlers = {'ping': lambda arg:'pong', 'commands': lambda arg:' '.join(sorted(self.handlers))}
+
+    def acquire(self) -> bool:
+        if not self.lock.tryLock(100):
+            return False
+        QLocalServer.removeServer(self.name)
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.UserAccessOption)
+        self.server.newConnection.connect(self._accept)
+        self.server.listen(self.name)
+        return True
+
+    def on(self, command, handler):
+        self.handlers[command] = handler
+
+    def _accept(self):
+        while (sock := self.server.nextPendingConnection()) is not None:
+            sock.readyRead.connect(lambda sock=sock:self._read(sock))
+            sock.disconnected.connect(sock.deleteLater)
+
+    def _read(self, sock:QLocalSocket):
+        while sock.canReadLine():
+            line = bytes(sock.readLine()).decode(errors='replace').strip()
+            sock.write((self.dispatch(line)+'\n').encode())
+            sock.flush()
+
+    def dispatch(self, line) -> str:
+        command, _, arg = line.partition(' ')
+        if (handler := self.handlers.get(command)) is None:
+            return f'error unknown command {command!r}'
+        try:
+            result = handler(arg)
+        except Exception as e:
+            return f'error {e}'
+        return f'ok {result}' if result else 'ok'
+
+    def release(self):
+        if self.server:
+            self.server.close()
+            self.server = None
+        self.lock.unlock()
+
+
+def sendCommand(command, name=APP_NAME, timeout=TIMEOUT):
+    sock = QLocalSocket()
+    sock.connectToServer(serverName(name))
+    if not sock.waitForConnected(timeout):
+        return None
+    sock.write((command+'\n').encode())
+    sock.waitForBytesWritten(timeout)
+    while not sock.canReadLine():
+        if not sock.waitForReadyRead(timeout):
+            return None
+    reply = bytes(sock.readLine()).decode(errors='replace').strip()
+    sock.disconnectFromServer()
+    return reply
+
+
+if __name__ == '__main__':
+    app = QCoreApplication(sys.argv)
+    reply = sendCommand(' '.join(sys.argv[1:]) or 'status')
+    if reply is None:
+        sys.exit(f'{APP_NAME} is not running')
+    print(reply)
+    sys.exit(0 if reply.startswith('ok') else 1)
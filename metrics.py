@@ -0,0 +1,156 @@
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+
+BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+
+class Histogram:
+    def __init__(self) -> None:
+        self.counts = [0]*(len(BUCKETS)+1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, secs):
+        self.counts[bisect.bisect_left(BUCKETS, secs)] += 1
+        self.sum += secs
+        self.count += 1
+        if secs > self.max:
+            self.max = secs
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank, seen = q*self.count, 0
+        for bound, n in zip(BUCKETS+(float('inf'),), self.counts):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def toDict(self):
+        return {'count': self.count, 'sum': self.sum, 'max': self.max, 'p50': self.quantile(0.5), 'p99': self.quantile(0.99),
+                'buckets': dict(zip([str(b) for b in BUCKETS]+['+Inf'], self.counts))}
+
+
+class Metrics:
+    prefix = 'ptc_'
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+        self.startTime = time.time()
+
+    def inc(self, name, n=1):
+        if self.enabled:
+            with self.lock:
+                self.counters[name] = self.counters.get(name, 0)+n
+
+    def observe(self, name, secs):
+        with self.lock:
+            if (histogram := self.histograms.get(name)) is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(secs)
+
+    def gauge(self, name, func):
+        self.gauges[name] = func
+
+    def timed(self, name, func):
+        perf_counter, observe = time.perf_counter, self.observe
+
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(name, perf_counter()-start)
+        wrapper.__wrapped__ = func
+        return wrapper
+
+    def instrument(self, owner, attr, name):
+        if not self.enabled:
+            return
+        raw = owner.__dict__.get(attr) if isinstance(owner, type) else None
+        if isinstance(raw, (classmethod, staticmethod)):
+            wrapped = type(raw)(self.timed(name, raw.__func__))
+        else:
+            wrapped = self.timed(name, raw or getattr(owner, attr))
+        setattr(owner, attr, wrapped)
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            data = {
+                'time': time.time(),
+                'uptime': time.time()-self.startTime,
+                'counters': dict(self.counters),
+                'latency': {name: h.toDict() for name, h in self.histograms.items()},
+            }
+        gauges = {}
+        for name, func in self.gauges.items():
+            try:
+                gauges[name] = func()
+            except Exception:
+                continue
+        data['gauges'] = gauges
+        return data
+
+    def toPrometheus(self, data=None) -> str:
+        data = data or self.snapshot()
+        lines = []
+        for name, value in data['counters'].items():
+            lines += [f'# TYPE {self.prefix}{name}_total counter', f'{self.prefix}{name}_total {value}']
+        for name, value in data['gauges'].items():
+            lines += [f'# TYPE {self.prefix}{name} gauge', f'{self.prefix}{name} {value}']
+        for name, h in data['latency'].items():
+            metric = f'{self.prefix}{name}_seconds'
+            lines.append(f'# TYPE {metric} histogram')
+            seen = 0
+            for bound, n in h['buckets'].items():
+                seen += n
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {seen}')
+            lines += [f'{metric}_sum {h["sum"]}', f'{metric}_count {h["count"]}']
+        return '\n'.join(lines)+'\n'
+
+    def dump(self, folder):
+        if not self.enabled:
+            return
+        folder = Path(folder)
+        data = self.snapshot()
+        for path, text in ((folder/'metrics.json', json.dumps(data, indent=1)), (folder/'metrics.prom', self.toPrometheus(data))):
+            tmp = path.with_suffix(path.suffix+'.tmp')
+            tmp.write_text(text)
+            os.replace(tmp, path)
+
+
+metrics = Metrics()
+
+
+def printReport(path, names=()):
+    data = json.loads(Path(path).read_text())
+    print(f"uptime {data['uptime']/3600:.1f} h, written {time.strftime('%H:%M:%S', time.localtime(data['time']))}")
+    print(f"{'latency':<20}{'count':>9}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, h in sorted(data['latency'].items()):
+        if not names or name in names:
+            print(f"{name:<20}{h['count']:>9}{h['p50']*1000:>10.3f}{h['p99']*1000:>10.3f}{h['max']*1000:>10.3f}")
+    for section in ('counters', 'gauges'):
+        for name, value in sorted(data[section].items()):
+            if not names or name in names:
+                print(f'{name:<20}{value:>9.6g}')
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    path = args.pop(0) if args and args[0].endswith('.json') else 'data/metrics.json'
+    try:
+        printReport(path, args)
+    except OSError:
+        sys.exit(f'no metrics at {path}; enable MetricsEnabled in data.json')
@@ -0,0 +1,68 @@
+import time
+
+
+class TokenBucket:
+    def __init__(self, rate, burst, now=0.0) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.last = now
+
+    def take(self, now) -> bool:
+        self.tokens = min(self.burst, self.tokens+(now-self.last)*self.rate)
+        self.last = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class NotificationDispatcher:
+    def __init__(self, deliver, window=1.5, limits=None, groups=None, clock=time.monotonic) -> None:
+        self.deliver = deliver
+        self.window = window
+        self.limits = limits or {}
+        self.groups = groups or {}
+        self.clock = clock
+        self.pending = {}
+        self.buckets = {}
+        self.lastDelivered = {}
+        self.delivered = self.coalesced = self.limited = 0
+
+    def submit(self, state):
+        now = self.clock()
+        key = self.groups.get(state, state)
+        if key in self.pending:
+            self.coalesced += 1
+            self.pending[key] = (state, self.pending[key][1], True)
+        else:
+            self.pending[key] = (state, now+self.window, False)
+        return self.nextDeadline()
+
+    def bucket(self, state, now) -> TokenBucket:
+        if state not in self.buckets:
+            rate, burst = self.limits.get(state, (1/10, 3))
+            self.buckets[state] = TokenBucket(rate, burst, now)
+        return self.buckets[state]
+
+    def pump(self):
+        now = self.clock()
+        for key, (state, deadline, merged) in list(self.pending.items()):
+            if deadline > now:
+                continue
+            del self.pending[key]
+            if merged and self.lastDelivered.get(key) is state:
+                continue
+            if not self.bucket(state, now).take(now):
+                self.limited += 1
+                continue
+            self.lastDelivered[key] = state
+            self.delivered += 1
+            self.deliver(state)
+        return self.nextDeadline()
+
+    def nextDeadline(self):
+        return min((deadline for _, deadline, _ in self.pending.values()), default=None)
+
+    def stats(self):
+        return {'delivered': self.delivered, 'coalesced': self.coalesced, 'limited': self.limited, 'pending': len(self.pending)}
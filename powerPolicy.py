@@ -0,0 +1,147 @@
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from batterySource import SysfsSource
+
+
+class PowerPolicy:
+    name = 'base'
+    keys = ()
+
+    def current(self) -> dict:
+        return None
+
+    def apply(self, values: dict):
+        raise NotImplementedError
+
+
+class PowercfgPolicy(PowerPolicy):
+    name = 'powercfg'
+    keys = ('batterySaverLevel',)
+
+    setting = ('scheme_current', 'sub_energysaver', 'esbattthreshold')
+
+    @staticmethod
+    def run(*args):
+        return subprocess.run(['powercfg', *args], check=True, capture_output=True, timeout=10, creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0))
+
+    def current(self):
+        try:
+            output = self.run('/query', *self.setting).stdout.decode(errors='replace')
+        except (OSError, subprocess.SubprocessError):
+            return None
+        # labels are localized, but the DC index is always the last value listed
+        values = re.findall(r'0x([0-9a-fA-F]+)', output)
+        return {'batterySaverLevel': int(values[-1], 16)} if values else None
+
+    def apply(self, values):
+        self.run('/setdcvalueindex', *self.setting, str(values['batterySaverLevel']))
+
+
+class SysfsPolicy(PowerPolicy):
+    name = 'sysfs'
+    keys = ('chargeStartLevel', 'chargeStopLevel')
+    knobs = {
+        'chargeStartLevel': ('charge_control_start_threshold', 'charge_start_threshold'),
+        'chargeStopLevel': ('charge_control_end_threshold', 'charge_stop_threshold'),
+    }
+
+    def __init__(self, root=SysfsSource.SYSFS_ROOT) -> None:
+        self.batteries = sorted(p for p in Path(root).glob('BAT*') if self.knob(p, 'chargeStopLevel'))
+
+    def knob(self, battery: Path, key):
+        return next((battery/name for name in self.knobs[key] if (battery/name).exists()), None)
+
+    def read(self, battery: Path):
+        return {key: int(path.read_text().strip() or 0) for key in self.keys if (path := self.knob(battery, key))}
+
+    def current(self):
+        values = {}
+        try:
+            for battery in self.batteries:
+                for key, value in self.read(battery).items():
+                    if values.setdefault(key, value) != value:
+                        return None
+        except (OSError, ValueError):
+            return None
+        return values
+
+    def apply(self, values):
+        for battery in self.batteries:
+            stop = self.knob(battery, 'chargeStopLevel')
+            start = self.knob(battery, 'chargeStartLevel')
+            order = [(stop, values['chargeStopLevel']), (start, values['chargeStartLevel'])]
+            if start and values['chargeStartLevel'] < int(stop.read_text().strip() or 0):
+                order.reverse()
+            for path, value in order:
+                if path:
+                    path.write_text(str(value))
+
+
+def getPolicy(root=SysfsSource.SYSFS_ROOT):
+    if sys.platform == 'win32':
+        return PowercfgPolicy() if shutil.which('powercfg') else None
+    if os.path.isdir(root):
+        policy = SysfsPolicy(root)
+        return policy if policy.batteries else None
+    return None
+
+
+class PolicyApplier:
+    def __init__(self, policy: PowerPolicy, onError=lambda message:None) -> None:
+        self.policy = policy
+        self.onError = onError
+        self.lock = threading.Lock()
+        self.executor = None
+        self.pending = self.applied = None
+        self.applies = self.skipped = self.failures = 0
+        self.lastError = ''
+
+    def request(self, values: dict):
+        if self.policy is None:
+            return
+        values = {key: values[key] for key in self.policy.keys if key in values}
+        with self.lock:
+            if len(values) != len(self.policy.keys) or values == (self.pending or self.applied):
+                self.skipped += 1
+                return
+            scheduled = self.pending is not None
+            self.pending = values
+        if not scheduled:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='powerPolicy')
+            self.executor.submit(self._apply)
+
+    def _apply(self):
+        with self.lock:
+            values, self.pending = self.pending, None
+        try:
+            if values == self.policy.current():
+                self.skipped += 1
+            else:
+                self.policy.apply(values)
+                self.applies += 1
+            self.applied = values
+        except (OSError, ValueError, subprocess.SubprocessError) as e:
+            self.failures += 1
+            detail = getattr(e, 'stderr', None)
+            self.lastError = f'{self.policy.name}: {detail.decode(errors="replace").strip() if detail else e}'
+            self.onError(self.lastError)
+
+    def wait(self):
+        if self.executor:
+            self.executor.submit(lambda:None).result()
+
+    def close(self):
+        if self.executor:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    def stats(self):
+        return {'policy': self.policy.name if self.policy else None, 'applies': self.applies, 'skipped': self.skipped, 'failures': self.failures, 'lastError': self.lastError}
@@ -0,0 +1,559 @@
+import os
+import json
+import threading
+import time
+from enum import Enum
+from collections import deque
+from pathlib import Path
+from historyWriter import HistoryWriter
+from historyArchive import HistoryArchive
+from estimator import RateEstimator
+from batterySource import getSource
+from metrics import metrics
+from fleetCollector import FleetSink
+from powerPolicy import PolicyApplier, getPolicy
+from ringBuffer import TieredBuffer, ExtendedHistory
+
+
+dataFolder = Path('data')
+historyFolder = dataFolder/ 'history'
+settingPath = str(dataFolder/'data.json')
+snapshotPath = dataFolder/'state.json'
+
+BatteryStatus = None
+historyWriter = None
+historySinks = []
+powerPolicy = None
+extendedMetrics = None
+policyFailedHooks = []
+
+def validateMainPath():
+    historyFolder.mkdir(parents=True, exist_ok=True)
+    return historyFolder
+
+def getFontWeightL(i=int()):
+    return 'bold' if i==75 else 'normal'
+
+settingChangedHooks = []
+validValueCache = {}
+
+class JsonManager:
+    writeDelay = 0.5
+    _timer = None
+    _lock = threading.Lock()
+   
+    @classmethod
+    def readData(cls):
+        try:
+            with open(str(settingPath), "r") as file:
+                return json.load(file)
+        except Exception as e:
+            cls.writeData()
+            return {}
+    
+    @classmethod
+    def writeData(cls):
+        with cls._lock:
+            if cls._timer:
+                cls._timer.cancel()
+                cls._timer = None
+            validateMainPath()
+            tmpPath = str(settingPath)+'.tmp'
+            with open(tmpPath, "w") as file:
+                json.dump(Setting.toDict(), file)
+            os.replace(tmpPath, str(settingPath))
+
+    @classmethod
+    def scheduleWrite(cls):
+        with cls._lock:
+            if cls._timer:
+                cls._timer.cancel()
+            cls._timer = threading.Timer(cls.writeDelay, cls.writeData)
+            cls._timer.daemon = True
+            cls._timer.start()
+
+    @classmethod
+    def flush(cls):
+        if cls._timer:
+            cls.writeData()
+
+def writeBatteryStatus(per, pluggedIn:bool):
+    historyWriter.append(per, pluggedIn)
+
+def writeHistory(per, pluggedIn:bool, band='-'):
+    writeBatteryStatus(per, pluggedIn)
+    for sink in historySinks:
+        sink.send(per, pluggedIn, band)
+
+class SystemClock:
+    monotonic = staticmethod(time.monotonic)
+    time = staticmethod(time.time)
+
+class Setting(Enum):
+    OnChargingColor = '#24f000'
+    NormalColor = '#1ee7fd'
+    LowColor = '#ff0f0f'
+    CriticalColor = '#df00da'
+    
+    FontSize = 14
+    FontFamily = 'Arial Rounded MT Bold'
+    FontWeight = 75
+
+    LowBatteryLevel = 40
+    NormalBatteryLevels = list(range(LowBatteryLevel, 100, 10))
+    FullBatteryLevel = 100
+    CriticalLevel = 25
+    ChargeLimitEnabled = False
+    ChargeStartLevel = 75
+    ChargeStopLevel = 80
+    Hysteresis = 0
+    RenotifyDelay = 30
+    NotifyCoalesceWindow = 1.5
+    
+    updateDelay = 2.5
+    MaxPollDelay = 30
+    eventFallbackDelay = 60
+    HisFileUpdateDelay = 1.5
+    SnapshotMaxAge = 900
+    HisFlushDelay = 300
+    HisFsyncPolicy = HistoryWriter.FSYNC_ROTATE
+    HisFormat = 'csv'
+    HisArchiveAfterDays = 7
+    HisRetentionDays = 0
+    HisArchiveCodec = 'xz'
+    HisCompactDelay = 120
+    ExtMetricsEnabled = True
+    FleetAddress = ''
+    MetricsEnabled = False
+    MetricsDelay = 60
+    
+    @classmethod
+    def toDict(cls):
+        return {member.name: member.value for member in cls}
+    
+    @classmethod
+    def fromDict(cls, d:dict):
+        for name, value in d.items():
+            try:
+                cls[name]._value_ = value
+            except:pass
+        validValueCache.clear()
+    
+    @property
+    def v(self):
+        return self.value
+    
+    @v.setter
+    def v(self, v):
+        self.setValue(v, self.updateFile)
+    
+    def setValue(self, v, after=lambda:None):
+        if self._value_ == v:
+            return
+        self._value_ = v
+        for key in [k for k in validValueCache if k[0] is self]:
+            del validValueCache[key]
+        for hook in settingChangedHooks:
+            hook(self)
+        after()
+    
+    @classmethod
+    def updateFile(cls):
+        JsonManager.scheduleWrite()
+    
+    def getValidValue(self, cls):
+        if (v:=validValueCache.get((self, cls))) is not None:
+            return v
+        try:
+            v = cls(self.v)
+        except:
+            v = normalSettings[self.name]
+            self.v = v
+        
+        validValueCache[(self, cls)] = v
+        return v
+
+normalSettings = Setting.toDict()
+
+def getToastIcon(p):
+    from PyQt5.QtGui import QIcon
+    return QIcon(QIcon(p).pixmap(32, 32))
+
+class State:
+    class Ctuple(tuple):
+
+        def title(self):
+            return self[0]+' Notify'
+        def message(self, per, estimate=''):
+            return self[1] + f'\nBattery is {per}%' + (f'\n{estimate}' if estimate else '')
+        def icon(self):
+            return getToastIcon(self[2])
+        def color(self):
+            return self[3]
+        def name(self):
+            return self[0].split()[0]
+
+    Low = Ctuple(('Low Battery', 'Pluged-In Your Device', ":immiApplication/icon/LowBattery.png", Setting.LowColor))
+    Normal = Ctuple(('Normal Battery', '', ":immiApplication/icon/NormalBattery.png", Setting.NormalColor))#* getToastIcon
+    Full = Ctuple(('Full Battery', 'Your Device is Full Charged', ":immiApplication/icon/FullCharging.png", Setting.NormalColor))
+    Critical = Ctuple(('Critical Battery', 'Pluged-In Your Device', Low[2], Setting.CriticalColor))
+    PluggedIn = Ctuple(('Plugged In', 'Charging...', ":immiApplication/icon/ChargingIn.png", Setting.OnChargingColor))
+    PluggedOut = Ctuple(('Plugged Out', '', ":immiApplication/icon/ChargingOut.png", Setting.NormalColor))
+
+    @classmethod
+    def members(cls):
+        return (cls.Low, cls.Normal, cls.Full, cls.Critical, cls.PluggedIn, cls.PluggedOut)
+
+stateNames = {state: name for name, state in vars(State).items() if isinstance(state, State.Ctuple)}
+class ThresholdTable:
+    rangeBands = {State.Low: 1, State.Critical: 1, State.Full: -1}
+
+    def __init__(self):
+        self.rebuild()
+
+    def rebuild(self):
+        full, low, critical = (m.getValidValue(int) for m in (Setting.FullBatteryLevel, Setting.LowBatteryLevel, Setting.CriticalLevel))
+        try:
+            normal = {int(l) for l in Setting.NormalBatteryLevels.v}
+        except:
+            normal = set(normalSettings[Setting.NormalBatteryLevels.name])
+        self.hysteresis = Setting.Hysteresis.getValidValue(int)
+
+        def band(pluggedIn, per):
+            if pluggedIn and per >= full:
+                return State.Full
+            elif not pluggedIn and per <= low:
+                return State.Critical if per <= critical else State.Low
+            elif per in normal:
+                return State.Normal
+        self.tables = tuple(tuple(band(pluggedIn, per) for per in range(101)) for pluggedIn in (False, True))
+        self.ranges = tuple(tuple(b if b in self.rangeBands else None for b in table) for table in self.tables)
+
+    def lookup(self, pluggedIn:bool, per:int, previousBand=None, previousPer=None):
+        table = self.tables[bool(pluggedIn)]
+        per = min(max(per, 0), 100)
+        band = table[per]
+        if self.hysteresis and band is not previousBand and previousPer is not None and previousBand in self.rangeBands:
+            exit = self.rangeBands[previousBand]
+            if (per-previousPer)*exit > 0 and table[min(max(per-exit*self.hysteresis, 0), 100)] is previousBand:
+                return previousBand
+        return band
+
+class StateMachine:
+    renotifyStates = (State.Critical, State.Full)
+
+    TRANSITIONS = {
+        'plug': lambda m, band, now: State.PluggedIn,
+        'unplug': lambda m, band, now: State.PluggedOut,
+        'level': lambda m, band, now: band,
+        'force': lambda m, band, now: band,
+        'idle': lambda m, band, now: band if band in m.renotifyStates and (m.state != band or now-m.lastNotifyTime >= m.renotifyDelay) else m.SKIP,
+    }
+    SKIP = object()
+
+    def __init__(self, pluggedIn:bool, per:int, now:float, table:ThresholdTable=None):
+        self.table = table or ThresholdTable()
+        self.plugged, self.per = pluggedIn, per
+        self.band = self.table.lookup(pluggedIn, per)
+        self.state = State.Normal
+        self.lastNotifyTime = now
+        self.renotifyDelay = Setting.RenotifyDelay.getValidValue(float)
+
+    @staticmethod
+    def color(pluggedIn:bool, band):
+        return Setting.OnChargingColor if pluggedIn else (band.color() if band else Setting.NormalColor)
+
+    def event(self, pluggedIn:bool, per:int, force=False):
+        if pluggedIn != self.plugged:
+            return 'plug' if pluggedIn else 'unplug'
+        if per != self.per:
+            return 'level'
+        return 'force' if force else 'idle'
+
+    def step(self, pluggedIn:bool, per:int, now:float, force=False):
+        event = self.event(pluggedIn, per, force)
+        band = self.table.lookup(pluggedIn, per, self.band, self.per)
+        state = self.TRANSITIONS[event](self, band, now)
+        if state is self.SKIP:
+            return None
+
+        color = self.color(pluggedIn, band)
+        if state in self.renotifyStates:
+            self.lastNotifyTime = now
+        self.plugged, self.per, self.band, self.state = pluggedIn, per, band, state or State.Normal
+        return state, color, event in ('plug', 'unplug')
+
+class StateSnapshot:
+    def __init__(self, path=snapshotPath, maxAge=None):
+        self.path = Path(path)
+        self.maxAge = maxAge
+
+    def load(self, now):
+        try:
+            data = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return None
+        maxAge = Setting.SnapshotMaxAge.getValidValue(float) if self.maxAge is None else self.maxAge
+        return data if 0 <= now-data.get('savedAt', 0) <= maxAge else None
+
+    def save(self, data:dict):
+        tmp = self.path.with_suffix('.tmp')
+        try:
+            tmp.write_text(json.dumps(data))
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+stateSnapshot = StateSnapshot()
+
+class BatterChecker:
+    def __init__(self, source=None, notify=lambda state:None, update=lambda color, per:None, clock=SystemClock, write=None, snapshot:StateSnapshot=None):
+        self.source = source or BatteryStatus
+        self.notify, self.update = notify, update
+        self.clock = clock
+        self.write = write or writeHistory
+        self.snapshot = snapshot
+        pluggedIn, per = self.source.get_state()
+        self.estimator = RateEstimator()
+
+        self.machine = StateMachine(pluggedIn, per, clock.monotonic())
+        self.lastFileWriteTime = clock.monotonic()
+
+        self.restored = bool(snapshot and (data:=snapshot.load(clock.time())) and self.restore(data))
+        self.estimator.update(clock.time(), per, pluggedIn)
+        if not self.restored:
+            self.writeBatteryStatus(force=True)
+
+    def restore(self, data:dict):
+        try:
+            offset = self.clock.monotonic()-self.clock.time()
+            machine = self.machine
+            machine.plugged, machine.per = bool(data['plugged']), int(data['per'])
+            machine.band = machine.table.lookup(machine.plugged, machine.per)
+            machine.state = getattr(State, data['state'])
+            machine.lastNotifyTime = data['lastNotify']+offset
+            self.lastFileWriteTime = data['lastWrite']+offset
+            self.estimator.restore(data['estimator'])
+        except (KeyError, TypeError, ValueError, AttributeError):
+            self.machine = StateMachine(*self.source.get_state(), self.clock.monotonic())
+            self.estimator.reset()
+            return False
+        return True
+
+    def saveSnapshot(self):
+        if self.snapshot:
+            offset = self.clock.time()-self.clock.monotonic()
+            self.snapshot.save({
+                'savedAt': self.clock.time(),
+                'plugged': self.previousStatus,
+                'per': self.previousPer,
+                'state': stateNames.get(self.previousState, 'Normal'),
+                'lastNotify': self.machine.lastNotifyTime+offset,
+                'lastWrite': self.lastFileWriteTime+offset,
+                'estimator': self.estimator.snapshot(),
+            })
+
+    def resume(self):
+        if not self.restored:
+            return False
+        if not self.check():
+            self.update(self.machine.color(self.previousStatus, self.machine.band), self.previousPer)
+        return True
+
+    @property
+    def previousStatus(self):
+        return self.machine.plugged
+
+    @property
+    def previousPer(self):
+        return self.machine.per
+
+    @property
+    def previousState(self):
+        return self.machine.state
+
+    def check(self, *args, force=False):
+        pluggedIn, per = self.source.get_state()
+        self.estimator.update(self.clock.time(), per, pluggedIn)
+
+        if (step:=self.machine.step(pluggedIn, per, self.clock.monotonic(), force)) is None:
+            return False
+        state, color, statusIsChanged = step
+
+        if state:
+            metrics.inc('notifications')
+            self.notify(state)
+
+        self.update(color, per)
+        if not self.writeBatteryStatus(force=statusIsChanged):
+            self.saveSnapshot()
+        return True
+    
+    def recheck(self):
+        self.check(force=True)
+
+    def estimate(self):
+        return self.estimator.describe(self.clock.time(), Setting.FullBatteryLevel.getValidValue(int))
+    
+    def writeBatteryStatus(self, *args, force=False):
+        ct = self.clock.monotonic()
+        if force or (ct-self.lastFileWriteTime)/60 >= Setting.HisFileUpdateDelay.getValidValue(float):
+            self.write(self.previousPer, self.previousStatus, self.machine.band.name() if self.machine.band else '-')
+            self.lastFileWriteTime = ct
+            self.saveSnapshot()
+            return True
+        return False
+
+class PollScheduler:
+    backoff = 1.5
+    nearRange = 2
+    nearFactor = 2
+
+    def __init__(self, checker:BatterChecker, eventDriven=False):
+        self.checker = checker
+        self.clock = checker.clock
+        self.minDelay = Setting.updateDelay.getValidValue(float)
+        self.maxDelay = max(Setting.eventFallbackDelay.getValidValue(float) if eventDriven else Setting.MaxPollDelay.getValidValue(float), self.minDelay)
+        self.interval = self.minDelay
+        self.tasks = []
+        self.wakeups = deque()
+        self.totalWakeups = 0
+        self.startTime = self.clock.monotonic()
+
+    def every(self, secs, func):
+        self.tasks.append([secs, self.clock.monotonic(), func])
+
+    def start(self):
+        self._arm(self.minDelay)
+
+    def _arm(self, secs):
+        self.interval = secs
+
+    def wake(self, *args):
+        now = self.clock.monotonic()
+        self.wakeups.append(now)
+        self.totalWakeups += 1
+        while self.wakeups[0] < now-3600:
+            self.wakeups.popleft()
+
+        before = (self.checker.previousStatus, self.checker.previousPer)
+        self.checker.check()
+        changed = before != (self.checker.previousStatus, self.checker.previousPer)
+
+        for task in self.tasks:
+            if now-task[1] >= task[0]:
+                task[1] = now
+                task[2]()
+        self._arm(self.nextInterval(changed))
+
+    def nextInterval(self, changed:bool):
+        machine = self.checker.machine
+        interval = self.minDelay if changed else min(self.interval*self.backoff, self.maxDelay)
+
+        ranges = machine.table.ranges[bool(machine.plugged)]
+        band = machine.band if machine.band in machine.table.rangeBands else None
+        per = min(max(machine.per, 0), 100)
+        if machine.plugged and per >= Setting.FullBatteryLevel.getValidValue(int):
+            interval = self.maxDelay
+        elif any(ranges[min(max(per+d, 0), 100)] is not band for d in (-self.nearRange, self.nearRange)):
+            interval = min(interval, self.minDelay*self.nearFactor)
+
+        if machine.band in machine.renotifyStates:
+            interval = min(interval, machine.renotifyDelay)
+        if rate:=self.checker.estimator.currentRate():
+            interval = min(interval, max(0.5/abs(rate), self.minDelay))
+        return max(interval, self.minDelay)
+
+    def isIdle(self):
+        return self.interval >= self.maxDelay/2
+
+    def wakeupsPerHour(self):
+        elapsed = min(self.clock.monotonic()-self.startTime, 3600)
+        return len(self.wakeups)*3600/elapsed if elapsed else 0.0
+
+    def stats(self):
+        return {'interval': self.interval, 'wakeups': self.totalWakeups, 'wakeupsPerHour': self.wakeupsPerHour()}
+
+class StartupProfile:
+    def __init__(self, start=None):
+        self.start = self.last = start or time.perf_counter()
+        self.phases = []
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.phases.append((name, now-self.last, now-self.start))
+        self.last = now
+
+    def report(self):
+        return '\n'.join(f'{name:<24}{phase*1000:9.1f} ms{total*1000:9.1f} ms' for name, phase, total in self.phases)
+
+def setSource(source=None):
+    global BatteryStatus
+    BatteryStatus = source or getSource()
+    return BatteryStatus
+
+def hasBattery():
+    return BatteryStatus._hasBattery() and BatteryStatus.get_state()[1]>=0
+
+def start(historyMaxAge=None):
+    global historyWriter, powerPolicy, extendedMetrics
+    validateMainPath()
+    Setting.fromDict(JsonManager.readData())
+    historyWriter = HistoryWriter(validateMainPath(), maxAge=historyMaxAge, fsync=Setting.HisFsyncPolicy.getValidValue(str), format=Setting.HisFormat.getValidValue(str))
+
+    if address:=Setting.FleetAddress.getValidValue(str):
+        try:
+            historySinks.append(FleetSink(address))
+        except (OSError, ValueError):
+            pass
+
+    if Setting.ExtMetricsEnabled.getValidValue(bool) and BatteryStatus.get_metrics() is not None:
+        extendedMetrics = TieredBuffer()
+        extendedMetrics.onFlush = ExtendedHistory(historyFolder, extendedMetrics.columns()).append
+
+    powerPolicy = PolicyApplier(getPolicy(), lambda message:[hook(message) for hook in policyFailedHooks])
+
+    metrics.enabled = Setting.MetricsEnabled.getValidValue(bool)
+    metrics.instrument(BatteryStatus, 'get_state', 'battery_get_state')
+    metrics.instrument(BatterChecker, 'check', 'check')
+    metrics.instrument(JsonManager, 'writeData', 'settings_write')
+    metrics.instrument(HistoryWriter, '_write', 'history_write')
+    return historyWriter
+
+def policyValues():
+    values = {'batterySaverLevel': Setting.LowBatteryLevel.getValidValue(int)}
+    if Setting.ChargeLimitEnabled.getValidValue(bool):
+        stop = min(max(Setting.ChargeStopLevel.getValidValue(int), 1), 100)
+        values.update(chargeStartLevel=min(max(Setting.ChargeStartLevel.getValidValue(int), 0), stop-1), chargeStopLevel=stop)
+    return values
+
+def applyPowerPolicy():
+    if powerPolicy:
+        powerPolicy.request(policyValues())
+
+def scheduleTasks(scheduler:PollScheduler):
+    scheduler.every(30, scheduler.checker.writeBatteryStatus)
+    if extendedMetrics:
+        scheduler.every(0, lambda:extendedMetrics.append(scheduler.clock.time(), BatteryStatus.get_metrics()))
+    scheduler.every(Setting.HisFlushDelay.getValidValue(float), historyWriter.flush)
+    archive = HistoryArchive(historyFolder, Setting.HisArchiveCodec.getValidValue(str), Setting.HisArchiveAfterDays.getValidValue(int), Setting.HisRetentionDays.getValidValue(int))
+    scheduler.every(Setting.HisCompactDelay.getValidValue(float), lambda:scheduler.isIdle() and archive.step())
+    if metrics.enabled:
+        metrics.gauge('wakeups_per_hour', scheduler.wakeupsPerHour)
+        metrics.gauge('poll_interval_seconds', lambda:scheduler.interval)
+        metrics.gauge('history_write_errors', lambda:historyWriter.errors)
+        metrics.gauge('history_rows_dropped', lambda:historyWriter.dropped)
+        scheduler.every(Setting.MetricsDelay.getValidValue(float), lambda:metrics.dump(dataFolder))
+
+def shutdown():
+    JsonManager.flush()
+    if historyWriter:
+        historyWriter.close()
+    for sink in historySinks:
+        sink.close()
+    historySinks.clear()
+    if powerPolicy:
+        powerPolicy.close()
+    if extendedMetrics:
+        extendedMetrics.flush()
+    metrics.dump(dataFolder)
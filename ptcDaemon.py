@@ -0,0 +1,79 @@
+import argparse
+import os
+import select
+import signal
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import ptcCore as core
+from metrics import metrics
+
+
+class Daemon:
+    def __init__(self, quiet=False) -> None:
+        self.quiet = quiet
+        self.checker = core.BatterChecker(notify=self.notify, update=self.update, snapshot=core.stateSnapshot)
+        self.scheduler = core.PollScheduler(self.checker, eventDriven=core.BatteryStatus.fileno() is not None)
+        core.scheduleTasks(self.scheduler)
+        core.policyFailedHooks.append(lambda message:self.log(f'Power policy failed: {message}'))
+
+    def log(self, text):
+        if not self.quiet:
+            print(f'{datetime.now():%H:%M:%S} {text}', flush=True)
+
+    def notify(self, state: core.State.Ctuple):
+        self.log(f'{state.title()}: ' + state.message(self.checker.previousPer, self.checker.estimate()).replace('\n', ' | ').strip(' |'))
+
+    def update(self, color, per):
+        self.log(f"Battery is {per}% ({'AC' if self.checker.previousStatus else 'DC'})")
+
+    def run(self):
+        fd = core.BatteryStatus.fileno()
+        if not self.checker.resume():
+            self.notify(self.checker.previousState)
+        core.applyPowerPolicy()
+        self.scheduler.start()
+        deadline = time.monotonic()+self.scheduler.interval
+        while True:
+            timeout = max(deadline-time.monotonic(), 0)
+            if fd is not None:
+                ready, _, _ = select.select([fd], [], [], timeout)
+                if ready and not core.BatteryStatus.changed():
+                    continue
+            else:
+                time.sleep(timeout)
+            self.scheduler.wake()
+            deadline = time.monotonic()+self.scheduler.interval
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Power TrayCon headless monitor')
+    parser.add_argument('--workdir', default=str(Path(sys.argv[0]).resolve().parent), help='folder that holds the data directory')
+    parser.add_argument('--once', action='store_true', help='print the current state and exit')
+    parser.add_argument('--quiet', action='store_true', help='only write history, do not print state changes')
+    args = parser.parse_args(argv)
+
+    os.chdir(args.workdir)
+    core.setSource()
+    if not core.hasBattery():
+        sys.exit('This device does not come equipped with a battery')
+    if args.once:
+        pluggedIn, per = core.BatteryStatus.get_state()
+        print(f"Battery is {per}% ({'AC' if pluggedIn else 'DC'})")
+        return
+
+    core.start()
+    metrics.instrument(Daemon, 'notify', 'notify')
+    signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))
+    try:
+        Daemon(args.quiet).run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        core.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+import argparse
+import bisect
+import json
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+import ptcCore as core
+from batterySource import BatterySource
+from historyArchive import HistoryArchive, readDayFile
+from ptcCore import BatterChecker, PollScheduler, Setting, stateNames
+
+
+def makeTrace(kind='discharge', ticks=5000, seed=1):
+    rnd = random.Random(seed)
+    samples = []
+    if kind == 'discharge':
+        per, step, pluggedIn = 100.0, -0.02, False
+    elif kind == 'charge':
+        per, step, pluggedIn = 15.0, 0.05, True
+    else:
+        per, step, pluggedIn = 60.0, -0.02, False
+    for i in range(ticks):
+        if kind == 'flapping' and rnd.random() < 0.02:
+            pluggedIn = not pluggedIn
+        if kind == 'flapping' and pluggedIn:
+            per = min(per-step, 100)
+        else:
+            per = min(max(per+step, 0), 100)
+        jitter = rnd.choice((0, 0, 0, 0, 1, -1))
+        samples.append((pluggedIn, int(min(max(round(per)+jitter, 0), 100))))
+    return samples
+
+def synthetic(kind='discharge', ticks=5000, interval=2.5, start=0, seed=1):
+    return [(start+i*interval, per, pluggedIn) for i, (pluggedIn, per) in enumerate(makeTrace(kind, ticks, seed))]
+
+def loadSamples(paths, start=None, end=None):
+    samples = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            samples += HistoryArchive(path).iterSamples(start, end)
+        else:
+            samples += readDayFile(path)
+    samples.sort()
+    return samples
+
+
+class SimClock:
+    def __init__(self, now=0.0) -> None:
+        self.now = float(now)
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+
+class ReplaySource(BatterySource):
+    name = 'replay'
+
+    def __init__(self, samples, clock:SimClock) -> None:
+        super().__init__()
+        self.samples = samples
+        self.times = [ts for ts, _, _ in samples]
+        self.clock = clock
+
+    def get_state(self):
+        _, per, pluggedIn = self.samples[max(bisect.bisect_right(self.times, self.clock.now)-1, 0)]
+        return pluggedIn, per
+
+    def _hasBattery(self):
+        return bool(self.samples)
+
+
+class Replay:
+    def __init__(self, samples, overrides=None, eventDriven=True) -> None:
+        self.samples = sorted(samples)
+        self.overrides = overrides or {}
+        self.eventDriven = eventDriven
+        self.events = []
+        self.checks = 0
+        self.elapsed = 0.0
+
+    def record(self, kind, detail):
+        self.events.append((self.clock.now, kind, detail))
+
+    def stateName(self):
+        machine = self.checker.machine
+        return f"{stateNames.get(machine.band, 'None')}/{'AC' if machine.plugged else 'battery'}"
+
+    def run(self):
+        saved = {member: member.v for member in map(Setting.__getitem__, self.overrides)}
+        for name, value in self.overrides.items():
+            Setting[name].setValue(value)
+        try:
+            self._run()
+        finally:
+            for member, value in saved.items():
+                member.setValue(value)
+        return self
+
+    def _run(self):
+        begin = time.perf_counter()
+        self.clock = SimClock(self.samples[0][0])
+        source = ReplaySource(self.samples, self.clock)
+        self.checker = BatterChecker(source, notify=lambda state:self.record('notify', stateNames[state]), clock=self.clock,
+                                     write=lambda per, pluggedIn, band:self.record('write', (per, pluggedIn)))
+        scheduler = PollScheduler(self.checker, self.eventDriven)
+        scheduler.every(30, self.checker.writeBatteryStatus)
+        scheduler.start()
+
+        state = self.stateName()
+        times, end = source.times, source.times[-1]
+        nextPoll = self.clock.now+scheduler.interval
+        while True:
+            i = bisect.bisect_right(times, self.clock.now)
+            nextSample = times[i] if self.eventDriven and i < len(times) else float('inf')
+            self.clock.now = min(nextPoll, nextSample)
+            if self.clock.now > end:
+                break
+            if self.clock.now == nextPoll or source.changed():
+                scheduler.wake()
+                self.checks += 1
+                nextPoll = self.clock.now+scheduler.interval
+                if (current := self.stateName()) != state:
+                    self.record('transition', f'{state}->{current}')
+                    state = current
+        self.clock.now = end
+        self.elapsed = time.perf_counter()-begin
+
+    def counts(self):
+        return Counter(kind for _, kind, _ in self.events)
+
+    def notifications(self):
+        return Counter(detail for _, kind, detail in self.events if kind == 'notify')
+
+    def report(self):
+        simulated = self.samples[-1][0]-self.samples[0][0]
+        counts = self.counts()
+        lines = [f'{len(self.samples)} samples over {simulated/3600:.1f} h replayed in {self.elapsed:.2f} s ({simulated/max(self.elapsed, 1e-9):.0f}x), {self.checks} checks',
+                 f"{counts['transition']} transitions, {counts['notify']} notifications, {counts['write']} history writes"]
+        lines += [f'  {state:<10}{n:>6}' for state, n in self.notifications().most_common()]
+        return '\n'.join(lines)
+
+
+def parseOverride(text):
+    name, _, value = text.partition('=')
+    try:
+        return name, json.loads(value)
+    except ValueError:
+        return name, value
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay battery history through the checker')
+    parser.add_argument('paths', nargs='*', help='history folders or *-ptc.csv/*-ptc.bin day files (default: data/history)')
+    parser.add_argument('--synthetic', choices=('discharge', 'charge', 'flapping'), help='replay a generated trace instead')
+    parser.add_argument('--ticks', type=int, default=20000)
+    parser.add_argument('--start', help='first day (YYYY-MM-DD) when replaying a folder')
+    parser.add_argument('--end', help='last day (YYYY-MM-DD) when replaying a folder')
+    parser.add_argument('--set', action='append', default=[], metavar='NAME=VALUE', help='override a setting, e.g. --set CriticalLevel=15')
+    parser.add_argument('--poll-only', action='store_true', help='ignore change events and wake only on the poll timer')
+    parser.add_argument('--events', action='store_true', help='print every recorded event')
+    args = parser.parse_args(argv)
+
+    if Path(core.settingPath).exists():
+        Setting.fromDict(json.loads(Path(core.settingPath).read_text()))
+    if args.synthetic:
+        samples = synthetic(args.synthetic, args.ticks)
+    else:
+        start = datetime.fromisoformat(args.start).timestamp() if args.start else None
+        end = datetime.fromisoformat(args.end).timestamp()+86399 if args.end else None
+        samples = loadSamples(args.paths or [core.historyFolder], start, end)
+    if not samples:
+        sys.exit('no samples to replay')
+
+    replay = Replay(samples, dict(map(parseOverride, args.set)), not args.poll_only).run()
+    if args.events:
+        for ts, kind, detail in replay.events:
+            print(f'{datetime.fromtimestamp(ts):%Y-%m-%d %H:%M:%S} {kind:<11}{detail}')
+    print(replay.report())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+import math
+from array import array
+from datetime import datetime
+from pathlib import Path
+
+
+FIELDS = ('voltage', 'current', 'power', 'energy', 'temperature')
+TIERS = ((0, 3600), (60, 1440), (900, 672))
+SUFFIX = '-ptc-ext.csv'
+
+
+def zeros(n):
+    return array('d', bytes(8*n))
+
+
+class Ring:
+    def __init__(self, width, capacity) -> None:
+        self.width = width
+        self.capacity = capacity
+        self.data = zeros(width*capacity)
+        self.head = self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, row):
+        self.data[self.head*self.width:(self.head+1)*self.width] = row
+        self.head = (self.head+1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def rows(self, since=None):
+        start = self.head-self.count
+        for j in range(start, self.head):
+            i = (j % self.capacity)*self.width
+            if since is None or self.data[i] >= since:
+                yield tuple(self.data[i:i+self.width])
+
+    def last(self):
+        if not self.count:
+            return None
+        i = ((self.head-1) % self.capacity)*self.width
+        return tuple(self.data[i:i+self.width])
+
+
+class TieredBuffer:
+    def __init__(self, fields=FIELDS, tiers=TIERS, onFlush=None) -> None:
+        self.fields = fields
+        self.width = 2+2*len(fields)
+        self.resolutions = [res for res, _ in tiers]
+        self.tiers = [Ring(self.width, capacity) for _, capacity in tiers]
+        self.acc = [zeros(self.width) for _ in tiers]
+        self.weights = [zeros(len(fields)) for _ in tiers]
+        self.open = [False]*len(tiers)
+        self.row = zeros(self.width)
+        self.rowWeights = zeros(len(fields))
+        self.onFlush = onFlush
+
+    def columns(self):
+        return ('t', 'n')+self.fields+tuple(f+'_peak' for f in self.fields)
+
+    def append(self, ts, values):
+        if values is None:
+            return
+        row, weights, n = self.row, self.rowWeights, len(self.fields)
+        row[0], row[1] = ts, 1
+        for k, v in enumerate(values):
+            row[2+k] = row[2+n+k] = math.nan if v is None else v
+            weights[k] = v is not None
+        self._push(0, row, weights)
+
+    def _push(self, level, row, weights):
+        self.tiers[level].append(row)
+        if level+1 < len(self.tiers):
+            self._accumulate(level+1, row, weights)
+        elif self.onFlush:
+            self.onFlush(row)
+
+    def _accumulate(self, level, row, weights):
+        acc, accWeights, n = self.acc[level], self.weights[level], len(self.fields)
+        bucket = row[0]//self.resolutions[level]*self.resolutions[level]
+        if self.open[level] and acc[0] != bucket:
+            self._close(level)
+        if not self.open[level]:
+            acc[0], acc[1] = bucket, 0
+            for k in range(n):
+                acc[2+k], acc[2+n+k], accWeights[k] = 0.0, math.nan, 0
+            self.open[level] = True
+        acc[1] += row[1]
+        for k in range(n):
+            if weight := weights[k]:
+                acc[2+k] += row[2+k]*weight
+                accWeights[k] += weight
+                if math.isnan(acc[2+n+k]) or abs(row[2+n+k]) > abs(acc[2+n+k]):
+                    acc[2+n+k] = row[2+n+k]
+
+    def _close(self, level):
+        acc, accWeights, n = self.acc[level], self.weights[level], len(self.fields)
+        self.open[level] = False
+        for k in range(n):
+            acc[2+k] = acc[2+k]/accWeights[k] if accWeights[k] else math.nan
+        self._push(level, acc, accWeights)
+
+    def flush(self):
+        for level in range(1, len(self.tiers)):
+            if self.open[level]:
+                self._close(level)
+
+    def latest(self) -> dict:
+        row = self.tiers[0].last()
+        return dict(zip(self.columns(), row)) if row else {}
+
+    def peak(self, field, since=None):
+        k = 2+len(self.fields)+self.fields.index(field)
+        return max((row[k] for tier in self.tiers for row in tier.rows(since) if not math.isnan(row[k])), key=abs, default=None)
+
+    def memory(self):
+        return sum(tier.data.itemsize*len(tier.data) for tier in self.tiers)
+
+
+class ExtendedHistory:
+    def __init__(self, folder, columns) -> None:
+        self.folder = Path(folder)
+        self.columns = columns
+
+    def append(self, row):
+        path = self.folder/(datetime.fromtimestamp(row[0]).strftime('%Y-%m')+SUFFIX)
+        new = not path.exists()
+        with open(path, 'a') as file:
+            if new:
+                file.write(','.join(self.columns)+'\n')
+            file.write(f'{row[0]:.0f},{row[1]:.0f},'+','.join(('' if math.isnan(v) else f'{v:.6g}') for v in row[2:])+'\n')
@@ -0,0 +1,81 @@
+import select
+import sys
+
+import pytest
+
+from batterySource import InotifyWatcher, SysfsSource
+
+
+def write(path, text):
+    path.write_text(text+'\n')
+
+
+@pytest.fixture
+def sysfs(tmp_path):
+    battery, adapter = tmp_path/'BAT0', tmp_path/'AC'
+    battery.mkdir()
+    adapter.mkdir()
+    write(battery/'type', 'Battery')
+    write(battery/'present', '1')
+    write(battery/'capacity', '64')
+    write(battery/'status', 'Discharging')
+    write(adapter/'type', 'Mains')
+    write(adapter/'online', '0')
+    return tmp_path
+
+
+def test_get_state(sysfs):
+    source = SysfsSource(sysfs, watch=False)
+    assert source._hasBattery()
+    assert source.get_state() == (False, 64)
+    write(sysfs/'AC'/'online', '1')
+    write(sysfs/'BAT0'/'capacity', '65')
+    assert source.get_state() == (True, 65)
+
+
+def test_percent_from_energy(sysfs):
+    (sysfs/'BAT0'/'capacity').unlink()
+    write(sysfs/'BAT0'/'energy_now', '30000000')
+    write(sysfs/'BAT0'/'energy_full', '40000000')
+    assert SysfsSource(sysfs, watch=False).get_state() == (False, 75)
+
+
+def test_changed_without_watcher(sysfs):
+    source = SysfsSource(sysfs, watch=False)
+    assert source.fileno() is None
+    assert source.changed()
+    assert not source.changed()
+    write(sysfs/'BAT0'/'capacity', '63')
+    assert source.changed()
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='inotify is Linux only')
+def test_inotify_watcher(sysfs):
+    source = SysfsSource(sysfs)
+    try:
+        assert isinstance(source.watcher, InotifyWatcher)
+        fd = source.fileno()
+        assert fd >= 0
+        assert not select.select([fd], [], [], 0)[0]
+        assert not source.changed()
+
+        write(sysfs/'BAT0'/'capacity', '63')
+        assert select.select([fd], [], [], 1)[0] == [fd]
+        assert source.changed()
+        assert source.get_state() == (False, 63)
+        assert not select.select([fd], [], [], 0)[0]
+
+        write(sysfs/'BAT0'/'capacity', '63')
+        assert not source.changed()
+        write(sysfs/'AC'/'online', '1')
+        assert source.changed()
+    finally:
+        source.close()
+
+
+def test_metrics(sysfs):
+    source = SysfsSource(sysfs, watch=False)
+    assert source.get_metrics() is None
+    write(sysfs/'BAT0'/'voltage_now', '12000000')
+    write(sysfs/'BAT0'/'current_now', '-1500000')
+    assert source.get_metrics() == (12.0, -1.5, 18.0, None, None)
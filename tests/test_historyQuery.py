@@ -0,0 +1,53 @@
+import os
+import time
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from historyWriter import HistoryWriter
+from historyQuery import HistoryQuery
+
+pytest.importorskip('numpy')
+
+
+@pytest.fixture
+def berlin(monkeypatch):
+    if not hasattr(time, 'tzset'):
+        pytest.skip('time.tzset is not available')
+    monkeypatch.setenv('TZ', 'Europe/Berlin')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+@pytest.fixture
+def history(tmp_path, berlin):
+    writer = HistoryWriter(tmp_path, batchSize=512, maxAge=None, format='bin')
+    first = datetime(2026, 1, 10).timestamp()
+    for i in range(181*48):
+        ts = first+i*1800
+        writer.append(i % 101, i % 7 == 0, datetime.fromtimestamp(ts))
+    writer.close()
+    return tmp_path
+
+
+def test_daily_buckets_follow_local_dates(history):
+    query = HistoryQuery(history)
+    start, end = datetime(2026, 1, 10), datetime(2026, 7, 9, 23, 59, 59)
+    days = query.aggregate(start, end, 'day')
+    assert [datetime.fromtimestamp(ts).date() for ts, _ in days] == [date(2026, 1, 10)+timedelta(days=i) for i in range(181)]
+    assert sum(n for _, (_, _, _, n) in days) == len(query.samples(start, end)[0])
+
+    partial = query.aggregate(start+timedelta(hours=12), end, 'day')
+    assert len(partial) == 181
+    assert partial[0][1][3] == 24
+
+
+def test_hourly_buckets_across_dst(history):
+    query = HistoryQuery(history)
+    start, end = datetime(2026, 3, 28), datetime(2026, 3, 31)
+    hours = query.aggregate(start, end, 'hour')
+    assert sum(n for _, (_, _, _, n) in hours) == len(query.samples(start, end)[0])
+    assert all(datetime.fromtimestamp(ts).minute == 0 for ts, _ in hours)
+    assert len(hours) == 3*24
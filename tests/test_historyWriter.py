@@ -0,0 +1,45 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from historyWriter import HistoryWriter
+
+
+def waitFor(condition, timeout=5.0):
+    end = time.monotonic()+timeout
+    while not condition():
+        assert time.monotonic() < end
+        time.sleep(0.01)
+
+
+@pytest.mark.parametrize('format', ['csv', 'bin'])
+def test_write_error_keeps_rows_and_thread(tmp_path, format):
+    writer = HistoryWriter(tmp_path, batchSize=4, maxAge=None, format=format)
+    start = datetime(2026, 3, 1, 23, 59, 50)
+    blocked = writer.fileFor((start+timedelta(days=1)).date())
+    blocked.mkdir()
+    for i in range(10):
+        writer.append(50, False, start+timedelta(seconds=3*i))
+    writer.flush()
+    waitFor(lambda:writer.errors)
+    assert writer.thread.is_alive()
+    assert writer.rowsWritten == 4
+
+    blocked.rmdir()
+    writer.flush()
+    waitFor(lambda:writer.rowsWritten == 10)
+    writer.close()
+    assert writer.dropped == 0
+    assert writer.fileFor(start.date()).stat().st_size == blocked.stat().st_size*4//6
+
+
+def test_pending_rows_are_capped(tmp_path):
+    writer = HistoryWriter(tmp_path, batchSize=1, maxAge=None, maxPending=5)
+    day = datetime(2026, 3, 1, 12)
+    writer.fileFor(day.date()).mkdir()
+    for i in range(8):
+        writer.append(50, False, day+timedelta(seconds=i))
+    writer.close()
+    assert writer.rowsWritten == 0
+    assert writer.dropped == 8
@@ -0,0 +1,25 @@
+import os
+
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+QtWidgets = pytest.importorskip('PyQt5.QtWidgets')
+
+from iconRenderer import IconRenderer
+from ptcCore import Setting
+
+
+@pytest.fixture(scope='module')
+def app():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def test_prewarm_keeps_every_color(app):
+    colors = [Setting.NormalColor.v, Setting.OnChargingColor.v, Setting.LowColor.v, Setting.CriticalColor.v]
+    renderer = IconRenderer(maxSize=256)
+    renderer.prewarm(colors, chunk=len(colors)*101)
+    assert len(renderer.cache) == len(colors)*101
+    renders = renderer.renders
+    for color in colors:
+        renderer.icon(color, 50)
+    assert renderer.renders == renders
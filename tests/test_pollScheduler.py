@@ -0,0 +1,33 @@
+import pytest
+
+from batterySource import TraceSource
+from ptcCore import BatterChecker, PollScheduler, Setting
+from replay import SimClock
+
+
+def settle(state, ticks=40):
+    clock = SimClock(0)
+    checker = BatterChecker(TraceSource([state]), clock=clock, write=lambda *args:None)
+    scheduler = PollScheduler(checker)
+    scheduler.start()
+    for _ in range(ticks):
+        clock.now += scheduler.interval
+        scheduler.wake()
+    return scheduler
+
+
+@pytest.mark.parametrize('state', [(True, 80), (True, 85), (False, 80), (False, 51), (False, 60)])
+def test_steady_level_backs_off(state):
+    scheduler = settle(state)
+    assert scheduler.interval == scheduler.maxDelay
+
+
+def test_full_on_ac_backs_off_to_renotify_delay():
+    scheduler = settle((True, 100))
+    assert scheduler.interval == min(scheduler.maxDelay, Setting.RenotifyDelay.getValidValue(float))
+
+
+@pytest.mark.parametrize('state', [(False, Setting.LowBatteryLevel.getValidValue(int)+1), (True, Setting.FullBatteryLevel.getValidValue(int)-2)])
+def test_near_range_edge_polls_faster(state):
+    scheduler = settle(state)
+    assert scheduler.interval == scheduler.minDelay*scheduler.nearFactor
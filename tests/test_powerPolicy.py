@@ -0,0 +1,92 @@
+from pathlib import Path
+
+import pytest
+
+from powerPolicy import PolicyApplier, SysfsPolicy
+
+
+START, STOP = 'charge_control_start_threshold', 'charge_control_end_threshold'
+
+
+def makeBattery(root, name, start, stop):
+    battery = root/name
+    battery.mkdir()
+    for knob, value in ((START, start), (STOP, stop)):
+        with open(battery/knob, 'w') as file:
+            file.write(f'{value}\n')
+    return battery
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    calls = []
+    writeText = Path.write_text
+
+    def record(path, text, *args, **kwargs):
+        calls.append((path.parent.name, path.name, int(text)))
+        return writeText(path, text, *args, **kwargs)
+    monkeypatch.setattr(Path, 'write_text', record)
+    return calls
+
+
+def thresholds(battery):
+    return int((battery/START).read_text()), int((battery/STOP).read_text())
+
+
+@pytest.mark.parametrize('before, after', [((40, 60), (75, 80)), ((75, 80), (40, 50)), ((40, 60), (20, 30)), ((20, 30), (90, 95))])
+def test_apply_keeps_start_below_stop(tmp_path, writes, before, after):
+    battery = makeBattery(tmp_path, 'BAT0', *before)
+    policy = SysfsPolicy(tmp_path)
+    assert policy.current() == {'chargeStartLevel': before[0], 'chargeStopLevel': before[1]}
+
+    state = dict(zip((START, STOP), before))
+    policy.apply({'chargeStartLevel': after[0], 'chargeStopLevel': after[1]})
+    for _, name, value in writes:
+        state[name] = value
+        assert state[START] < state[STOP]
+    assert thresholds(battery) == after
+
+
+def test_applier_skips_matching_values(tmp_path, writes):
+    makeBattery(tmp_path, 'BAT0', 75, 80)
+    applier = PolicyApplier(SysfsPolicy(tmp_path))
+    applier.request({'chargeStartLevel': 75, 'chargeStopLevel': 80})
+    applier.wait()
+    applier.request({'chargeStartLevel': 75, 'chargeStopLevel': 80})
+    applier.close()
+    assert writes == []
+    assert applier.stats()['applies'] == 0 and applier.stats()['skipped'] == 2
+
+
+def test_applier_writes_every_battery(tmp_path, writes):
+    batteries = [makeBattery(tmp_path, 'BAT0', 75, 80), makeBattery(tmp_path, 'BAT1', 40, 60)]
+    policy = SysfsPolicy(tmp_path)
+    assert policy.current() is None
+    applier = PolicyApplier(policy)
+    applier.request({'chargeStartLevel': 75, 'chargeStopLevel': 80})
+    applier.close()
+    assert applier.stats()['applies'] == 1
+    assert [thresholds(b) for b in batteries] == [(75, 80), (75, 80)]
+    assert policy.current() == {'chargeStartLevel': 75, 'chargeStopLevel': 80}
+
+
+def test_stop_only_battery(tmp_path, writes):
+    battery = tmp_path/'BAT0'
+    battery.mkdir()
+    with open(battery/'charge_stop_threshold', 'w') as file:
+        file.write('100\n')
+    policy = SysfsPolicy(tmp_path)
+    assert policy.current() == {'chargeStopLevel': 100}
+    policy.apply({'chargeStartLevel': 75, 'chargeStopLevel': 80})
+    assert writes == [('BAT0', 'charge_stop_threshold', 80)]
+
+
+def test_failure_is_reported(tmp_path):
+    makeBattery(tmp_path, 'BAT0', 40, 60)
+    (tmp_path/'BAT0'/STOP).unlink()
+    (tmp_path/'BAT0'/STOP).mkdir()
+    errors = []
+    applier = PolicyApplier(SysfsPolicy(tmp_path), errors.append)
+    applier.request({'chargeStartLevel': 75, 'chargeStopLevel': 80})
+    applier.close()
+    assert applier.stats()['failures'] == 1 and errors
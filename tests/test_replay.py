@@ -0,0 +1,16 @@
+from replay import Replay, synthetic
+
+
+def test_flapping_records_every_plug_change():
+    samples = synthetic('flapping', 3000)
+    plugs = sum(a[2] != b[2] for a, b in zip(samples, samples[1:]))
+    replay = Replay(samples).run()
+    transitions = [detail.split('->') for _, kind, detail in replay.events if kind == 'transition']
+    assert plugs
+    assert sum(a.split('/')[1] != b.split('/')[1] for a, b in transitions) == plugs
+
+
+def test_none_band_is_not_normal():
+    replay = Replay(synthetic('discharge', 2000)).run()
+    names = {name for _, kind, detail in replay.events if kind == 'transition' for name in detail.split('->')}
+    assert {'None/battery', 'Normal/battery'} <= names
@@ -0,0 +1,44 @@
+import math
+
+from ringBuffer import TieredBuffer
+
+
+def test_missing_first_reading_keeps_peak_and_mean():
+    buffer = TieredBuffer(fields=('current',), tiers=((0, 10), (60, 10), (900, 10)))
+    buffer.append(0, (None,))
+    buffer.append(10, (-2.0,))
+    buffer.append(20, (-30.0,))
+    buffer.append(30, (-1.0,))
+    buffer.append(60, (-1.0,))
+    t, n, mean, peak = next(buffer.tiers[1].rows())
+    assert (t, n, peak) == (0, 4, -30.0)
+    assert mean == -11.0
+    assert buffer.peak('current') == -30.0
+
+
+def test_bucket_without_readings_is_nan():
+    buffer = TieredBuffer(fields=('current', 'temperature'), tiers=((0, 10), (60, 10)))
+    buffer.append(0, (1.0, None))
+    buffer.append(60, (1.0, None))
+    _, n, current, temperature, currentPeak, temperaturePeak = next(buffer.tiers[1].rows())
+    assert (n, current, currentPeak) == (1, 1.0, 1.0)
+    assert math.isnan(temperature) and math.isnan(temperaturePeak)
+
+
+def test_weights_carry_into_coarser_tiers():
+    buffer = TieredBuffer(fields=('power',), tiers=((0, 200), (60, 10), (900, 10)))
+    for i in range(15):
+        buffer.append(i*60, (None,))
+    buffer.append(15*60+1, (8.0,))
+    buffer.append(15*60+61, (8.0,))
+    buffer.append(30*60, (8.0,))
+    buffer.flush()
+    rows = list(buffer.tiers[2].rows())
+    assert math.isnan(rows[0][2])
+    assert rows[1][1:] == (2, 8.0, 8.0)
+
+
+def test_none_metrics_are_ignored():
+    buffer = TieredBuffer()
+    buffer.append(0, None)
+    assert buffer.latest() == {}
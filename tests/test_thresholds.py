@@ -0,0 +1,76 @@
+import pytest
+
+from ptcCore import Setting, State, StateMachine, ThresholdTable
+
+
+@pytest.fixture(params=[0, 2, 5])
+def table(request):
+    saved = Setting.Hysteresis.v
+    Setting.Hysteresis.setValue(request.param)
+    yield ThresholdTable()
+    Setting.Hysteresis.setValue(saved)
+
+
+def walk(pluggedIn, levels):
+    machine = StateMachine(pluggedIn, levels[0], 0)
+    states, bands = [], [machine.band]
+    for i, per in enumerate(levels[1:], 1):
+        if result := machine.step(pluggedIn, per, i):
+            states.append((per, result[0]))
+        bands.append(machine.band)
+    return states, bands
+
+
+def test_lookup_transitions(table):
+    for pluggedIn, raw in enumerate(table.tables):
+        for previousPer in range(101):
+            for per in range(101):
+                previousBand = raw[previousPer]
+                band = table.lookup(pluggedIn, per, previousBand, previousPer)
+                if band is raw[per]:
+                    continue
+                assert table.hysteresis
+                assert band is previousBand and band in table.rangeBands
+                assert (per-previousPer)*table.rangeBands[band] > 0
+                assert abs(per-previousPer) > 0
+                assert min(abs(per-p) for p in range(101) if raw[p] is previousBand) <= table.hysteresis
+
+
+def test_normal_levels_ignore_hysteresis(table):
+    for pluggedIn, raw in enumerate(table.tables):
+        for previousPer in range(101):
+            previousBand = raw[previousPer]
+            if previousBand in table.rangeBands:
+                continue
+            for per in range(101):
+                assert table.lookup(pluggedIn, per, previousBand, previousPer) is raw[per]
+
+
+def test_discharge_notifies_every_normal_level(table):
+    states, bands = walk(False, list(range(100, -1, -1)))
+    normal = [per for per, state in states if state is State.Normal]
+    assert normal == [per for per in range(99, -1, -1) if table.tables[0][per] is State.Normal]
+    assert [band for band in dict.fromkeys(bands) if band in table.rangeBands] == [State.Low, State.Critical]
+
+
+def test_bands_start_at_their_levels(table):
+    levels = list(range(100, -1, -1))
+    _, bands = walk(False, levels)
+    first = {band: per for per, band in reversed(list(zip(levels, bands)))}
+    assert first[State.Low] == Setting.LowBatteryLevel.getValidValue(int)
+    assert first[State.Critical] == Setting.CriticalLevel.getValidValue(int)
+
+    levels = list(range(50, 101))
+    _, bands = walk(True, levels)
+    assert levels[bands.index(State.Full)] == Setting.FullBatteryLevel.getValidValue(int)
+
+
+def test_discharge_53_to_45_emits_normal(table):
+    assert (50, State.Normal) in walk(False, list(range(53, 44, -1)))[0]
+
+
+def test_low_edge_does_not_flap(table):
+    low = Setting.LowBatteryLevel.getValidValue(int)
+    _, bands = walk(False, [low+3, low, low+1, low, low+1, low])
+    expected = [None]+[State.Low]*5 if table.hysteresis else [None, State.Low, None, State.Low, None, State.Low]
+    assert bands == expected